@@ -45,12 +45,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'users.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'users.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'logisticsbackend.urls'
@@ -77,13 +79,134 @@ WSGI_APPLICATION = 'logisticsbackend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# single writer, synchronous=NORMAL is durable across application crashes in
+# WAL mode, and busy_timeout makes a blocked writer wait instead of failing.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -65536,  # KiB, 64 MiB per connection
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            # Take the write lock when a transaction starts. A deferred
+            # transaction that reads first and then writes fails at once with
+            # "database is locked" when another writer got there first.
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Read replicas: request reads go to one of DATABASE_REPLICAS and writes to
+# default. A client that wrote reads from default for REPLICA_PIN_SECONDS,
+# which must cover the replication lag. To try it locally with a copy of
+# db.sqlite3 as the replica, refreshed by manage.py copy_replicas:
+#
+# DATABASES['replica'] = {**DATABASES['default'], 'NAME': BASE_DIR / 'replica.sqlite3', 'TEST': {'MIRROR': 'default'}}
+# DATABASE_REPLICAS = ['replica']
+
+DATABASE_ROUTERS = ['users.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 10
+
+# Write views retry a transaction that still hits a locked database this
+# many times, backing off from DB_LOCK_RETRY_DELAY seconds
+DB_LOCK_RETRIES = 3
+DB_LOCK_RETRY_DELAY = 0.05
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Use a shared backend (Redis, Memcached, database) in production so that
+# invalidations reach every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds a rendered dashboard table may be served from the cache
+DASHBOARD_CACHE_TIMEOUT = 300
+
+
+# Live board events
+# users.events.LocalBroker only reaches clients of the publishing worker; use
+# users.events.CacheBroker with a shared cache when running several workers.
+
+EVENTS_BROKER = 'users.events.LocalBroker'
+# Seconds between keepalive comments on an idle event stream
+EVENTS_HEARTBEAT = 15
+
+
+# Driver app delta sync
+# Rows changed in the last SYNC_SETTLE_SECONDS wait for the next poll, so that
+# slow transactions are not skipped. Clients whose watermark is older than
+# the tombstone retention get a full resync; prune with manage.py
+# prune_tombstones.
+
+SYNC_PAGE_SIZE = 500
+SYNC_SETTLE_SECONDS = 5
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+
+# Archival
+# manage.py archive_logistics moves cargo picked up and bookings finished more
+# than ARCHIVE_AFTER_DAYS days ago into the archive tables, ARCHIVE_BATCH_SIZE
+# rows per transaction. Driver history pages read both tables.
+
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 1000
+
+
+# Background tasks
+# Run by manage.py run_worker from the database queue, see users.taskqueue.
+# Workers claim TASK_BATCH_SIZE tasks at a time and must finish them within
+# TASK_VISIBILITY_TIMEOUT seconds, or another worker runs them again. Failed
+# tasks are retried after TASK_RETRY_DELAY seconds, doubling up to
+# TASK_MAX_RETRY_DELAY, until TASK_MAX_ATTEMPTS.
+
+TASK_MODULES = ['users.tasks']
+TASK_BATCH_SIZE = 20
+TASK_VISIBILITY_TIMEOUT = 300
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+TASK_MAX_RETRY_DELAY = 3600
+
+# Booking notifications are printed by the worker; configure SMTP in production
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+
+# Demand forecasts
+# manage.py forecast_demand and /analytics/forecast/ fit hour-of-week demand
+# profiles to the last FORECAST_WEEKS complete weeks, weighing older weeks
+# down with a half-life of FORECAST_HALF_LIFE_WEEKS, and suggest slot limits
+# that cover the FORECAST_QUANTILE level of demand. Needs NumPy.
+
+FORECAST_WEEKS = 26
+FORECAST_HALF_LIFE_WEEKS = 8
+FORECAST_QUANTILE = 0.9
+FORECAST_CACHE_TIMEOUT = 3600
+
+
+# Profiling
+# Fraction of requests profiled by users.profiling.ProfilingMiddleware, 0 turns
+# it off. Histograms are kept in the cache for PROFILING_WINDOWS windows of
+# PROFILING_WINDOW seconds; manage.py perfreport needs a shared cache backend.
+
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_WINDOW = 300
+PROFILING_WINDOWS = 12
+PROFILING_N_PLUS_ONE_THRESHOLD = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .forms import CustomUserCreationForm, CustomUserChangeForm
-from .models import CustomUser, Cargo
+from .models import Company, CustomUser, Cargo, DepotCapacity, Task
 
 class CustomUserAdmin(UserAdmin):
     add_form = CustomUserCreationForm
@@ -25,10 +25,41 @@ class CustomUserAdmin(UserAdmin):
 
 admin.site.register(CustomUser, CustomUserAdmin)
 
+@admin.register(Company)
+class CompanyAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+
 @admin.register(Cargo)
 class CargoAdmin(admin.ModelAdmin):
-    list_display = ('cargo_number', 'cargo_owner', 'storage', 'arrival_date', 'pickup_date', 'arrived_at_storage', 'is_picked_up', 'port')
-    list_filter = ('arrived_at_storage', 'is_picked_up', 'port')
+    list_display = ('cargo_number', 'cargo_owner', 'storage', 'arrival_date', 'pickup_date', 'stage', 'arrived_at_storage', 'is_picked_up', 'port')
+    list_filter = ('stage', 'arrived_at_storage', 'is_picked_up', 'port')
+    readonly_fields = ('stage',)
     search_fields = ('cargo_number', 'cargo_owner', 'storage')
     date_hierarchy = 'created_at'
-    ordering = ('-created_at',)
\ No newline at end of file
+    ordering = ('-created_at',)
+
+@admin.register(DepotCapacity)
+class DepotCapacityAdmin(admin.ModelAdmin):
+    list_display = ('depot', 'total_capacity', 'booked', 'available', 'current_capacity', 'last_updated')
+    list_select_related = ('depot',)
+    readonly_fields = ('active_bookings',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_booking_stats()
+
+    @admin.display(ordering='booked')
+    def booked(self, obj):
+        return obj.booked
+
+    @admin.display(ordering='available')
+    def available(self, obj):
+        return obj.available
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'available_at', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('claimed_by', 'last_error', 'created_at')
+    ordering = ('available_at', 'id')
@@ -0,0 +1,96 @@
+"""
+Async JSON API for the driver mobile app.
+
+The views run on the event loop under ASGI and read through the async ORM,
+so a gate queue full of polling trucks does not hold a worker thread per
+request. Clients authenticate with the JWT access token issued at login,
+either as a Bearer header or the access_token cookie, or with a session.
+"""
+from django.http import JsonResponse
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .archive import booking_history, picked_cargo_history
+from .models import Cargo, ContainerBooking, CustomUser
+from .pagination import apaginate_keyset, page_as_json
+from .sync import driver_changes
+
+CREATED_ORDERING = ('-created_at', '-id')
+
+# kind: (queryset, or hot and archived querysets, for a driver, keyset ordering)
+DRIVER_CARGO_LISTS = {
+    'available': (Cargo.objects.available_to, CREATED_ORDERING),
+    'scheduled': (Cargo.objects.scheduled_for, ('scheduled_pickup_time', 'id')),
+    'picked': (picked_cargo_history, ('-scheduled_pickup_time', '-id')),
+}
+
+DRIVER_CARGO_FIELDS = (
+    'id', 'cargo_number', 'cargo_owner', 'storage', 'arrival_date', 'pickup_date',
+    'scheduled_pickup_time', 'cfs_received', 'cfs_picked_up', 'is_picked_up', 'stage',
+)
+BOOKING_FIELDS = ('id', 'container_number', 'depot_id', 'booking_time', 'status', 'created_at')
+BOOKING_ORDERING = ('-booking_time', '-id')
+
+
+def driver_cargo_list(driver, kind):
+    """Queryset and ordering of one of the driver's cargo lists."""
+    queryset, ordering = DRIVER_CARGO_LISTS[kind]
+    return queryset(driver), ordering
+
+
+async def api_user(request):
+    """The user of a JWT access token, falling back to the session user."""
+    header = request.headers.get('Authorization', '')
+    raw_token = header[len('Bearer '):] if header.startswith('Bearer ') else request.COOKIES.get('access_token')
+    if raw_token:
+        try:
+            token = AccessToken(raw_token)
+        except TokenError:
+            return None
+        return await CustomUser.objects.filter(pk=token['user_id'], is_active=True).afirst()
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+async def api_driver(request):
+    """(driver, None) or (None, error response)."""
+    user = await api_user(request)
+    if user is None:
+        return None, JsonResponse({'error': 'Authentication required.'}, status=401)
+    if user.user_type != 'DRIVER':
+        return None, JsonResponse({'error': 'Only drivers can use this API.'}, status=403)
+    return user, None
+
+
+async def driver_cargo(request, kind):
+    """One keyset page of the driver's available, scheduled or picked up cargo."""
+    if kind not in DRIVER_CARGO_LISTS:
+        return JsonResponse({'error': f'Unknown cargo list {kind}.'}, status=404)
+    driver, error = await api_driver(request)
+    if error:
+        return error
+    queryset, ordering = driver_cargo_list(driver, kind)
+    page = await apaginate_keyset(request, queryset, ordering)
+    return JsonResponse(page_as_json(page, DRIVER_CARGO_FIELDS))
+
+
+async def driver_bookings(request):
+    """One keyset page of the driver's container bookings, archived ones included, plus the active count."""
+    driver, error = await api_driver(request)
+    if error:
+        return error
+    page = await apaginate_keyset(request, booking_history(driver), BOOKING_ORDERING)
+    data = page_as_json(page, BOOKING_FIELDS)
+    # Archived bookings are never active
+    data['active'] = await ContainerBooking.objects.filter(
+        driver=driver, status__in=ContainerBooking.ACTIVE_STATUSES
+    ).acount()
+    return JsonResponse(data)
+
+
+async def driver_sync(request):
+    """Changes to the driver's cargo and bookings since the ``since`` watermark."""
+    driver, error = await api_driver(request)
+    if error:
+        return error
+    return JsonResponse(await driver_changes(driver, request.GET.get('since')))
@@ -2,4 +2,12 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'users'
\ No newline at end of file
+    name = 'users'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .profiling import instrument_queries, sample_rate
+
+        # Before any connection is opened, so request threads' connections are wrapped too
+        if sample_rate() > 0:
+            instrument_queries()
\ No newline at end of file
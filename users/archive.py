@@ -0,0 +1,111 @@
+"""
+Hot/cold archival of finished cargo and bookings.
+
+archive_logistics() moves picked up Cargo and completed or cancelled
+ContainerBooking rows that have not changed for a while into ArchivedCargo
+and ArchivedContainerBooking, keeping their ids. Each batch is copied and
+deleted in one short transaction, so the write lock is never held for long,
+and the job can be stopped and restarted at any point.
+
+The driver history reads, picked_cargo_history() and booking_history(),
+return the hot and the archived queryset together; paginate_keyset() merges
+a list of querysets into one sequence.
+"""
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .caching import bump_scope_versions
+from .models import ArchivedCargo, ArchivedContainerBooking, Cargo, ContainerBooking
+from .signals import booking_scopes_for_values, cargo_scopes_for_values
+
+
+def archive_after_days():
+    return getattr(settings, 'ARCHIVE_AFTER_DAYS', 90)
+
+
+def default_batch_size():
+    return getattr(settings, 'ARCHIVE_BATCH_SIZE', 1000)
+
+
+def picked_cargo_history(driver):
+    return [Cargo.objects.picked_up_by(driver), ArchivedCargo.objects.filter(driver=driver)]
+
+
+def booking_history(driver):
+    return [ContainerBooking.objects.filter(driver=driver), ArchivedContainerBooking.objects.filter(driver=driver)]
+
+
+def archivable_cargo(cutoff):
+    return Cargo.objects.filter(is_picked_up=True, updated_at__lt=cutoff)
+
+
+def archivable_bookings(cutoff):
+    return ContainerBooking.objects.filter(status__in=('COMPLETED', 'CANCELLED'), booking_time__lt=cutoff, updated_at__lt=cutoff)
+
+
+def _delete_ids(using, model, ids):
+    connection = connections[using]
+    table, pk = map(connection.ops.quote_name, (model._meta.db_table, model._meta.pk.column))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {pk} IN ({", ".join(["%s"] * len(ids))})', ids)
+
+
+def _archive_batch(source, archive_model, scopes_for_values, after_id, batch_size):
+    """Move the next batch after ``after_id``, returns (rows moved, last id seen)."""
+    attnames = [field.attname for field in archive_model._meta.concrete_fields if field.name != 'archived_at']
+    with transaction.atomic():
+        # Walk the primary key so every batch continues where the last stopped
+        rows = list(source.filter(pk__gt=after_id).order_by('pk').values(*attnames)[:batch_size])
+        if not rows:
+            return 0, None
+        ids = [row['id'] for row in rows]
+        archive_model.objects.bulk_create([archive_model(**row) for row in rows], ignore_conflicts=True)
+        # A plain DELETE without the delete signals: archived rows are not
+        # deletions, so no tombstones, events or ledger releases. Finished
+        # rows hold no slot reservations.
+        _delete_ids(source.db, source.model, ids)
+        scopes = set().union(*map(scopes_for_values, rows))
+        transaction.on_commit(partial(bump_scope_versions, *scopes))
+    return len(rows), ids[-1]
+
+
+def archive_rows(source, archive_model, scopes_for_values, batch_size=None, pause=0, limit=None, log=None):
+    """Move every row of ``source`` into ``archive_model`` in batches, returns the number moved."""
+    batch_size = batch_size or default_batch_size()
+    moved, after_id = 0, 0
+    while limit is None or moved < limit:
+        count, after_id = _archive_batch(
+            source, archive_model, scopes_for_values, after_id, batch_size if limit is None else min(batch_size, limit - moved)
+        )
+        if not count:
+            break
+        moved += count
+        if log:
+            log(f'{archive_model._meta.verbose_name_plural}: {moved}')
+        if pause:
+            # Let queued writers take the lock between batches
+            time.sleep(pause)
+    return moved
+
+
+def archive_logistics(older_than_days=None, batch_size=None, pause=0, limit=None, dry_run=False, log=None):
+    """
+    Archive cargo picked up and bookings finished more than
+    ``older_than_days`` days ago, ARCHIVE_AFTER_DAYS by default. Returns the
+    row counts per table, or with ``dry_run`` the counts that would be moved.
+    """
+    if older_than_days is None:
+        older_than_days = archive_after_days()
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    cargo, bookings = archivable_cargo(cutoff), archivable_bookings(cutoff)
+    if dry_run:
+        return {'cargo': cargo.count(), 'bookings': bookings.count()}
+    return {
+        'cargo': archive_rows(cargo, ArchivedCargo, cargo_scopes_for_values, batch_size, pause, limit, log),
+        'bookings': archive_rows(bookings, ArchivedContainerBooking, booking_scopes_for_values, batch_size, pause, limit, log),
+    }
@@ -0,0 +1,448 @@
+"""
+Load benchmark for the key flows, driven through the Django test client.
+
+Each flow is a function that takes a logged-in Client and the seeded world
+and performs one request. run_benchmark() runs every flow from a pool of
+threads, each thread with its own client and database connection, and
+returns throughput and latency percentiles as a JSON-ready dict. Flows write
+to the database, so run it against a seeded copy, never production data.
+"""
+import asyncio
+import io
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Cargo, CustomUser
+from .seeding import DEFAULT_PASSWORD
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class BenchmarkWorld:
+    """Seeded users by type and the cargo ids the write flows work on."""
+
+    def __init__(self, prefix, password=DEFAULT_PASSWORD):
+        self.prefix = prefix
+        self.password = password
+        self.users = {}
+        for user in CustomUser.objects.filter(email__startswith=f'{prefix.lower()}-', email__endswith='@example.com'):
+            self.users.setdefault(user.user_type, []).append(user)
+        if not self.users:
+            raise ValueError(f'No seeded users with prefix {prefix}, run seed_logistics first.')
+        self.depot_ids = [user.pk for user in self.users.get('DEPOT', [])]
+        self._lock = threading.Lock()
+        self._unassigned = {}
+        self._port_cargo = {}
+
+    def user(self, rng, user_type):
+        users = self.users.get(user_type)
+        if not users:
+            raise ValueError(f'No seeded {user_type} users.')
+        return rng.choice(users)
+
+    def unassigned_cargo(self, company_id):
+        """Pop an unassigned cargo id of the company, loading a batch when empty."""
+        with self._lock:
+            ids = self._unassigned.get(company_id)
+            if not ids:
+                ids = self._unassigned[company_id] = list(
+                    Cargo.objects.owned_by(company_id).filter(driver__isnull=True).values_list('id', flat=True)[:500]
+                )
+            return ids.pop() if ids else None
+
+    def port_cargo(self, rng, port_id):
+        with self._lock:
+            if port_id not in self._port_cargo:
+                self._port_cargo[port_id] = list(
+                    Cargo.objects.filter(port_id=port_id).values_list('id', flat=True)[:1000]
+                )
+            ids = self._port_cargo[port_id]
+        return rng.choice(ids) if ids else None
+
+
+def _future_slot(rng, days=30):
+    start = timezone.localtime() + timedelta(days=rng.randint(1, days))
+    return start.replace(hour=rng.randint(7, 18), minute=0, second=0, microsecond=0)
+
+
+def dashboard_flow(user_type):
+    def flow(client, world, rng):
+        return client.get(reverse(f'{user_type.lower()}_dashboard'))
+    flow.user_type = user_type
+    return flow
+
+
+def login_flow(client, world, rng):
+    user = world.user(rng, 'PORT')
+    return client.post(reverse('login'), {'email': user.email, 'password': world.password})
+login_flow.user_type = None
+
+
+def container_booking_flow(client, world, rng):
+    booking_time = _future_slot(rng)
+    return client.post(reverse('container_booking_create'), {
+        'depot': rng.choice(world.depot_ids),
+        'booking_time': booking_time.strftime('%Y-%m-%dT%H:%M'),
+    })
+container_booking_flow.user_type = 'DRIVER'
+
+
+def schedule_pickup_flow(client, world, rng):
+    pk = world.unassigned_cargo(client.user.company_id)
+    if pk is None:
+        return None
+    pickup = _future_slot(rng, days=365)
+    return client.post(reverse('schedule_pickup', args=[pk]), {
+        'pickup_date': pickup.date().isoformat(),
+        'pickup_time': pickup.strftime('%H:%M'),
+    })
+schedule_pickup_flow.user_type = 'DRIVER'
+
+
+def toggle_status_flow(client, world, rng):
+    pk = world.port_cargo(rng, client.user.pk)
+    if pk is None:
+        return None
+    return client.post(reverse('cargo_toggle_status', args=[pk, 'arrived_at_storage']))
+toggle_status_flow.user_type = 'PORT'
+
+
+FLOWS = {
+    'dashboard_port': dashboard_flow('PORT'),
+    'dashboard_cfs': dashboard_flow('CFS'),
+    'dashboard_depot': dashboard_flow('DEPOT'),
+    'dashboard_driver': dashboard_flow('DRIVER'),
+    'login': login_flow,
+    'container_booking_create': container_booking_flow,
+    'schedule_pickup': schedule_pickup_flow,
+    'cargo_toggle_status': toggle_status_flow,
+}
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, statuses, skipped, duration):
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'skipped': skipped,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'errors': sum(count for status, count in statuses.items() if status >= 500),
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(latencies) / duration, 1) if duration else None,
+        'latency_ms': {},
+    }
+    if latencies:
+        summary['latency_ms'] = {
+            'min': round(latencies[0], 2),
+            'mean': round(sum(latencies) / len(latencies), 2),
+            **{f'p{p}': round(percentile(latencies, p), 2) for p in PERCENTILES},
+            'max': round(latencies[-1], 2),
+        }
+    return summary
+
+
+def _worker(flow, world, requests, seed, host):
+    rng = random.Random(seed)
+    # Count failures as 500s instead of aborting the run
+    client = Client(raise_request_exception=False, HTTP_HOST=host)
+    client.user = None
+    if flow.user_type:
+        client.user = world.user(rng, flow.user_type)
+        client.force_login(client.user)
+    latencies, statuses, skipped = [], {}, 0
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = flow(client, world, rng)
+            elapsed = (time.perf_counter() - start) * 1000
+            if response is None:
+                skipped += 1
+                continue
+            latencies.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    finally:
+        connections.close_all()
+    return latencies, statuses, skipped
+
+
+def _jobs(name, requests, concurrency, seed, host):
+    shares = [requests // concurrency + (n < requests % concurrency) for n in range(concurrency)]
+    return [(name, share, f'{seed}:{name}:{n}', host) for n, share in enumerate(shares) if share]
+
+
+def _run_jobs(world, jobs):
+    """Run worker jobs on one thread each, returns the merged summary per flow."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        results = list(pool.map(lambda job: (job[0], _worker(FLOWS[job[0]], world, *job[1:])), jobs))
+    duration = time.perf_counter() - start
+
+    merged = {}
+    for name, (worker_latencies, worker_statuses, worker_skipped) in results:
+        latencies, statuses, skipped = merged.setdefault(name, ([], {}, [0]))
+        latencies += worker_latencies
+        skipped[0] += worker_skipped
+        for status, count in worker_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    return {
+        name: summarize(latencies, statuses, skipped[0], duration)
+        for name, (latencies, statuses, skipped) in merged.items()
+    }
+
+
+def run_flow(name, world, requests, concurrency, seed, host='localhost'):
+    """Run ``requests`` calls of one flow spread over ``concurrency`` threads."""
+    return _run_jobs(world, _jobs(name, requests, concurrency, seed, host))[name]
+
+
+def run_mixed(names, world, requests, concurrency, seed, host='localhost'):
+    """
+    Run several flows at the same time, ``requests`` calls over ``concurrency``
+    threads each, so writers contend with each other and with readers.
+    """
+    return _run_jobs(world, [job for name in names for job in _jobs(name, requests, concurrency, seed, host)])
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_meta(**extra):
+    return {
+        'revision': git_revision(),
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'debug': settings.DEBUG,
+        **extra,
+    }
+
+
+def run_benchmark(prefix, flows=None, requests=200, concurrency=4, seed=0, host='localhost',
+                  password=DEFAULT_PASSWORD, label=None):
+    world = BenchmarkWorld(prefix, password)
+    results = {
+        'meta': run_meta(
+            label=label, prefix=prefix, requests=requests, concurrency=concurrency, seed=seed,
+        ),
+        'flows': {},
+    }
+    for name in flows or FLOWS:
+        results['flows'][name] = run_flow(name, world, requests, concurrency, seed, host)
+    return results
+
+
+def compare(baseline, current):
+    """Relative change of throughput and p95 per flow present in both runs."""
+    changes = {}
+    for name, result in current['flows'].items():
+        before = baseline.get('flows', {}).get(name)
+        if not before or not before.get('throughput_rps') or not before['latency_ms']:
+            continue
+        changes[name] = {
+            'throughput_rps': round(result['throughput_rps'] / before['throughput_rps'] - 1, 3),
+            'p95_ms': round(result['latency_ms']['p95'] / before['latency_ms']['p95'] - 1, 3),
+        }
+    return changes
+
+
+# Driver read paths served by async views, compared under both handlers
+SERVING_PATHS = (
+    '/dashboard/driver/available/',
+    '/dashboard/driver/scheduled/',
+    '/dashboard/driver/picked/',
+    '/driver/container-bookings/',
+    '/api/driver/cargo/available/',
+    '/api/driver/bookings/',
+)
+
+
+def session_cookie(user):
+    client = Client()
+    client.force_login(user)
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def serve_wsgi(path, cookie, requests, concurrency, host):
+    """Call the WSGI handler from ``concurrency`` threads, like a threaded WSGI server."""
+    handler = get_wsgi_application()
+
+    def call(_):
+        status = []
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+            'SERVER_NAME': host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': host, 'HTTP_COOKIE': cookie, 'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        start = time.perf_counter()
+        body = handler(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+        try:
+            for _ in body:
+                pass
+        finally:
+            body.close()
+        return (time.perf_counter() - start) * 1000, status[0]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(requests)))
+    return results, time.perf_counter() - start
+
+
+async def _asgi_call(application, path, cookie, host):
+    request_sent = False
+    status = None
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected until the handler stops listening
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', host.encode()), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0), 'server': (host, 80),
+    }
+    start = time.perf_counter()
+    await application(scope, receive, send)
+    return (time.perf_counter() - start) * 1000, status
+
+
+def serve_asgi(path, cookie, requests, concurrency, host):
+    """
+    Drive the ASGI application from one event loop with ``concurrency``
+    requests in flight, the way uvicorn serves it, minus the sockets.
+    """
+    application = get_asgi_application()
+
+    async def run():
+        pending = iter(range(requests))
+        results = []
+
+        async def worker():
+            for _ in pending:
+                results.append(await _asgi_call(application, path, cookie, host))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    return results, time.perf_counter() - start
+
+
+def run_serving_benchmark(prefix, paths=None, requests=200, concurrency=16, host='localhost',
+                          password=DEFAULT_PASSWORD, label=None):
+    """Throughput and latency of each driver read path under WSGI and under ASGI."""
+    world = BenchmarkWorld(prefix, password)
+    cookie = session_cookie(world.user(random.Random(0), 'DRIVER'))
+    results = {
+        'meta': run_meta(label=label, prefix=prefix, requests=requests, concurrency=concurrency),
+        'paths': {},
+    }
+    for path in paths or SERVING_PATHS:
+        results['paths'][path] = {}
+        for mode, serve in (('wsgi', serve_wsgi), ('asgi', serve_asgi)):
+            calls, duration = serve(path, cookie, requests, concurrency, host)
+            statuses = {}
+            for _, status in calls:
+                statuses[status] = statuses.get(status, 0) + 1
+            results['paths'][path][mode] = summarize([latency for latency, _ in calls], statuses, 0, duration)
+            connections.close_all()
+    return results
+
+
+# Write flows plus a reader, run together against each SQLite profile
+CONTENTION_FLOWS = ('container_booking_create', 'schedule_pickup', 'cargo_toggle_status', 'dashboard_port')
+
+
+def sqlite_profiles():
+    """
+    The configured connection OPTIONS against Django's SQLite defaults. The
+    defaults switch the file back to a rollback journal, as WAL persists, and
+    run without lock retries.
+    """
+    return {
+        'default': ({'init_command': 'PRAGMA journal_mode=DELETE'}, 0),
+        'tuned': (dict(connections.settings[DEFAULT_DB_ALIAS].get('OPTIONS', {})), None),
+    }
+
+
+@contextmanager
+def sqlite_profile(options, retries=None):
+    """Open new connections with ``options`` and, if given, ``retries`` lock retries."""
+    database = connections.settings[DEFAULT_DB_ALIAS]
+    saved = database.get('OPTIONS', {})
+    connections.close_all()
+    database['OPTIONS'] = options
+    try:
+        with override_settings(**({} if retries is None else {'DB_LOCK_RETRIES': retries})):
+            yield
+    finally:
+        connections.close_all()
+        database['OPTIONS'] = saved
+
+
+def run_contention_benchmark(prefix, flows=None, requests=200, concurrency=4, seed=0, host='localhost',
+                             password=DEFAULT_PASSWORD, label=None):
+    """Mixed write and read load under each profile of sqlite_profiles()."""
+    if connection.vendor != 'sqlite':
+        raise ValueError('The contention benchmark compares SQLite settings, the database is not SQLite.')
+    world = BenchmarkWorld(prefix, password)
+    flows = flows or CONTENTION_FLOWS
+    results = {
+        'meta': run_meta(label=label, prefix=prefix, requests=requests, concurrency=concurrency, seed=seed),
+        'profiles': {},
+    }
+    for name, (options, retries) in sqlite_profiles().items():
+        with sqlite_profile(options, retries):
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+            results['profiles'][name] = {
+                'options': options,
+                'journal_mode': journal_mode,
+                'flows': run_mixed(flows, world, requests, concurrency, seed, host),
+            }
+    results['comparison'] = compare(results['profiles']['default'], results['profiles']['tuned'])
+    return results
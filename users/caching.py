@@ -0,0 +1,154 @@
+import hashlib
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.safestring import mark_safe
+
+from .routers import pin_seconds, primary_reads, replicas
+
+CSRF_PLACEHOLDER = '__csrf_token__'
+
+
+def fragment_timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def _version_key(scope):
+    return f'scope-version:{scope}'
+
+
+def scope_versions(*scopes):
+    """
+    Current version of each scope. A missing version is seeded from the clock
+    rather than 1, so an evicted counter never matches a stale fragment.
+    """
+    keys = {_version_key(scope): scope for scope in scopes}
+    versions = cache.get_many(keys.keys())
+    for key in keys.keys() - versions.keys():
+        cache.add(key, time.time_ns(), timeout=None)
+        versions[key] = cache.get(key)
+    return [versions[_version_key(scope)] for scope in scopes]
+
+
+def _changed_key(scope):
+    return f'scope-changed:{scope}'
+
+
+def bump_scope_versions(*scopes):
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+    if replicas():
+        cache.set_many({_changed_key(scope): True for scope in scopes}, pin_seconds())
+
+
+def changed_recently(scopes):
+    """
+    Whether a scope changed within the replica pin window. Pages cached or
+    tagged under the new version must then be read from the primary, a
+    lagging replica would pin the old rows to the new version.
+    """
+    return bool(replicas() and cache.get_many([_changed_key(scope) for scope in scopes]))
+
+
+def cached_fragment(request, name, scopes, template_name, get_context):
+    """
+    Render ``template_name`` once per user, query string and scope versions.
+
+    ``get_context`` is only called on a miss, so a hit costs one cache round
+    trip and no queries. The CSRF token is left as a placeholder in the cached
+    HTML and filled in for each response.
+    """
+    versions = scope_versions(*scopes)
+    key = ':'.join([
+        'fragment', name, str(request.user.pk), request.GET.urlencode(),
+        *(f'{scope}={version}' for scope, version in zip(scopes, versions)),
+    ])
+    html = cache.get(key)
+    if html is None:
+        with primary_reads() if changed_recently(scopes) else nullcontext():
+            context = dict(get_context(), csrf_token=CSRF_PLACEHOLDER)
+            html = render_to_string(template_name, context)
+        cache.set(key, html, fragment_timeout())
+    return mark_safe(html.replace(CSRF_PLACEHOLDER, get_token(request)))
+
+
+def scope_etag(request, user, scopes):
+    """
+    Weak ETag of a page built from ``scopes``: the URL, the user, their CSRF
+    secret, which the page's forms embed, and the current scope versions.
+    """
+    versions = scope_versions(*scopes)
+    # Make sure the secret exists now, so the page rendered next uses it
+    get_token(request)
+    raw = ':'.join([
+        request.get_full_path(), str(user.pk), user.user_type, request.META['CSRF_COOKIE'],
+        *(f'{scope}={version}' for scope, version in zip(scopes, versions)),
+    ])
+    return f'W/"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def _conditional_etag(request, user, get_scopes):
+    """The page's ETag, or None, and the context its view renders in."""
+    if request.method not in ('GET', 'HEAD'):
+        return None, nullcontext()
+    scopes = get_scopes(user)
+    # A page showing flash messages must not be revalidated later
+    if scopes is None or len(get_messages(request)):
+        return None, nullcontext()
+    return scope_etag(request, user, scopes), primary_reads() if changed_recently(scopes) else nullcontext()
+
+
+def _tag(response, etag):
+    if response.status_code == 200 and not response.has_header('ETag'):
+        response['ETag'] = etag
+        # Browsers keep the page but revalidate it on every load
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_on_scopes(get_scopes):
+    """
+    Answer GET requests with 304 Not Modified while the versions of the
+    scopes the page is built from are unchanged, before the view runs a
+    query or renders. ``get_scopes(user)`` returns the scopes, or None when
+    the view should always run, e.g. for a user type it redirects.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_inner(request, *args, **kwargs):
+                user = await request.auser()
+                etag, reads = _conditional_etag(request, user, get_scopes)
+                if etag is not None:
+                    not_modified = get_conditional_response(request, etag=etag)
+                    if not_modified is not None:
+                        return not_modified
+                with reads:
+                    response = await view(request, *args, **kwargs)
+                return response if etag is None else _tag(response, etag)
+            return async_inner
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            etag, reads = _conditional_etag(request, request.user, get_scopes)
+            if etag is not None:
+                not_modified = get_conditional_response(request, etag=etag)
+                if not_modified is not None:
+                    return not_modified
+            with reads:
+                response = view(request, *args, **kwargs)
+            return response if etag is None else _tag(response, etag)
+        return inner
+    return decorator
@@ -0,0 +1,211 @@
+"""
+Live board events.
+
+Model changes are published as small JSON events on channels named like the
+cache scopes (``depot:<id>``, ``storage:<company id>``, ...), and boards
+subscribe to them over server-sent events. The broker named by EVENTS_BROKER
+delivers them: LocalBroker fans out inside one process, CacheBroker relays
+through the shared cache so every worker sees every event. Other brokers,
+e.g. on Redis pub/sub, only need to implement publish() and feed received
+events to fan_out().
+"""
+import asyncio
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+DEFAULT_BROKER = 'users.events.LocalBroker'
+
+
+class Subscription:
+    """Bounded queue of events for one client, read from its event loop."""
+
+    def __init__(self, broker, channels, maxsize):
+        self.broker = broker
+        self.channels = set(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client this far behind reloads instead of replaying
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """Next event, or None when nothing arrives within ``timeout`` seconds."""
+        if self.overflowed:
+            self.overflowed = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return {'type': 'resync'}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Keeps the subscriptions of this process and fans events out to them."""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels, maxsize=100):
+        subscription = Subscription(self, channels, maxsize)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self._subscriptions.pop(channel, None)
+
+    def fan_out(self, channel, event):
+        # Publishers run in sync worker threads, so hand over to each loop
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+    def publish(self, channel, event):
+        raise NotImplementedError
+
+
+class LocalBroker(Broker):
+    """In-process delivery. Only clients of the publishing worker see events."""
+
+    def publish(self, channel, event):
+        self.fan_out(channel, event)
+
+
+class CacheBroker(Broker):
+    """
+    Delivery through the shared cache. Events are appended to a log keyed by
+    a cache counter and one relay task per event loop polls the log and fans
+    new entries out locally. Needs a shared backend such as Redis or
+    Memcached; with LocMemCache it behaves like LocalBroker.
+    """
+    SEQUENCE_KEY = 'events:sequence'
+    MISSING_POLLS = 5
+
+    def __init__(self):
+        super().__init__()
+        self.poll_interval = getattr(settings, 'EVENTS_POLL_INTERVAL', 0.5)
+        self.timeout = getattr(settings, 'EVENTS_LOG_TIMEOUT', 60)
+        self._relays = {}
+
+    def _event_key(self, sequence):
+        return f'events:{sequence}'
+
+    def publish(self, channel, event):
+        cache.add(self.SEQUENCE_KEY, 0, timeout=None)
+        sequence = cache.incr(self.SEQUENCE_KEY)
+        cache.set(self._event_key(sequence), (channel, event), self.timeout)
+
+    def subscribe(self, channels, maxsize=100):
+        subscription = super().subscribe(channels, maxsize)
+        relay = self._relays.get(subscription.loop)
+        if relay is None or relay.done():
+            self._relays[subscription.loop] = subscription.loop.create_task(self._relay())
+        return subscription
+
+    async def _relay(self):
+        position = await cache.aget(self.SEQUENCE_KEY) or 0
+        missing_polls = 0
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            latest = await cache.aget(self.SEQUENCE_KEY) or 0
+            if latest <= position:
+                continue
+            keys = [self._event_key(sequence) for sequence in range(position + 1, latest + 1)]
+            entries = await cache.aget_many(keys)
+            for key in keys:
+                if key not in entries:
+                    # Published but not written yet, or expired: wait a few
+                    # polls before skipping it
+                    missing_polls += 1
+                    if missing_polls < self.MISSING_POLLS:
+                        break
+                else:
+                    self.fan_out(*entries[key])
+                missing_polls = 0
+                position += 1
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, 'EVENTS_BROKER', DEFAULT_BROKER))()
+        return _broker
+
+
+def publish(channels, event):
+    broker = get_broker()
+    for channel in channels:
+        broker.publish(channel, event)
+
+
+def publish_on_commit(channels, event):
+    """Publish once the current transaction commits, so boards never see rolled back changes."""
+    transaction.on_commit(partial(publish, set(channels), event))
+
+
+def board_channels(user):
+    """Channels a user's board subscribes to, matching the dashboard scopes."""
+    if user.user_type == 'DEPOT':
+        return [f'depot:{user.pk}']
+    if user.user_type == 'CFS':
+        return [f'storage:{user.company_id}'] if user.company_id else []
+    if user.user_type == 'PORT':
+        return [f'port:{user.pk}']
+    if user.user_type == 'DRIVER':
+        return [f'driver:{user.pk}'] + ([f'owner:{user.company_id}'] if user.company_id else [])
+    return []
+
+
+CARGO_EVENT_FIELDS = ('cargo_number', 'stage', 'arrived_at_storage', 'cfs_received', 'cfs_picked_up', 'is_picked_up')
+
+
+def cargo_event(event_type, cargo):
+    return {
+        'type': event_type,
+        'cargo': {'id': cargo.pk, **{field: getattr(cargo, field) for field in CARGO_EVENT_FIELDS}},
+    }
+
+
+def booking_event(event_type, booking):
+    # The driver name is only sent when it is already loaded, never queried
+    driver = booking.driver if type(booking).driver.is_cached(booking) else None
+    return {
+        'type': event_type,
+        'booking': {
+            'id': booking.pk,
+            'container_number': booking.container_number,
+            'booking_time': booking.booking_time.isoformat(),
+            'status': booking.status,
+            'driver': driver.get_full_name() if driver else None,
+        },
+        # Filled in after commit by the publisher
+        'active_bookings': None,
+    }
@@ -0,0 +1,114 @@
+import csv
+import heapq
+from datetime import date
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ArchivedCargo, Cargo
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# (column name, Cargo and ArchivedCargo lookup) for every manifest column
+MANIFEST_COLUMNS = (
+    ('cargo_number', 'cargo_number'),
+    ('cargo_owner', 'cargo_owner'),
+    ('storage', 'storage'),
+    ('arrival_date', 'arrival_date'),
+    ('pickup_date', 'pickup_date'),
+    ('scheduled_pickup_time', 'scheduled_pickup_time'),
+    ('arrived_at_storage', 'arrived_at_storage'),
+    ('cfs_received', 'cfs_received'),
+    ('cfs_picked_up', 'cfs_picked_up'),
+    ('is_picked_up', 'is_picked_up'),
+    ('stage', 'stage'),
+    ('port', 'port__company_name'),
+    ('port_email', 'port__email'),
+    ('cfs', 'cfs__company_name'),
+    ('cfs_email', 'cfs__email'),
+    ('driver', 'driver__username'),
+    ('driver_phone', 'driver__phone'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+)
+
+STATUS_FLAGS = ('arrived_at_storage', 'cfs_received', 'cfs_picked_up', 'is_picked_up')
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _parse_bool(name, value):
+    value = str(value).lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f'{name} must be true or false.')
+
+
+def parse_manifest_filters(params):
+    """
+    Turn request or command parameters into Cargo filter kwargs. Supports
+    ``from``/``to`` (arrival date, inclusive), ``port`` and the status flags.
+    Raises ValueError on malformed input.
+    """
+    filters = {}
+    try:
+        if params.get('from'):
+            filters['arrival_date__gte'] = date.fromisoformat(params['from'])
+        if params.get('to'):
+            filters['arrival_date__lte'] = date.fromisoformat(params['to'])
+    except ValueError:
+        raise ValueError('from and to must be dates in YYYY-MM-DD format.')
+    if params.get('port'):
+        try:
+            filters['port_id'] = int(params['port'])
+        except ValueError:
+            raise ValueError('port must be a user id.')
+    for flag in STATUS_FLAGS:
+        if params.get(flag) not in (None, ''):
+            filters[flag] = _parse_bool(flag, params[flag])
+    return filters
+
+
+def manifest_rows(filters, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield manifest tuples straight from a database cursor. Rows are read
+    ``chunk_size`` at a time with no model instances, so memory stays flat
+    regardless of how many rows match. Archived cargo is merged in by id.
+    """
+    lookups = [lookup for _, lookup in MANIFEST_COLUMNS]
+    cursors = [
+        model.objects.filter(**filters).order_by('id').values_list('id', *lookups).iterator(chunk_size=chunk_size)
+        for model in (Cargo, ArchivedCargo)
+    ]
+    return (row[1:] for row in heapq.merge(*cursors))
+
+
+class Echo:
+    """File-like object whose write() hands back the value for streaming."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in MANIFEST_COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    names = [name for name, _ in MANIFEST_COLUMNS]
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(names, row))) + '\n'
+
+
+def manifest_lines(export_format, rows):
+    if export_format == 'ndjson':
+        return ndjson_lines(rows)
+    return csv_lines(rows)
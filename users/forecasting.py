@@ -0,0 +1,184 @@
+"""
+Hour-of-week slot demand forecasts for depots and pickup windows.
+
+The booking and pickup history is read with one values_list query per table
+into NumPy arrays and binned by depot, week and hour of the week with
+np.unique and np.bincount, without a Python loop over rows or depots. A
+profile is the recency-weighted mean and standard deviation of the weekly
+counts in each of the 168 hours of the week. Its ``quantile`` level under a
+normal approximation is the demand to plan for, and the peak of that over
+the week is the suggested slot limit, to compare with DepotSlot.SLOT_LIMIT
+and PickupSlot.SLOT_LIMIT.
+
+Only complete weeks are used, in the current time zone's UTC offset. NumPy
+is an optional dependency needed by this module only.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from statistics import NormalDist
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import IntegerField, Value
+from django.utils import timezone
+
+from .models import ArchivedCargo, ArchivedContainerBooking, Cargo, ContainerBooking, DepotSlot, PickupSlot
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HOURS_PER_WEEK = 168
+WEEK_SECONDS = HOURS_PER_WEEK * 3600
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+HISTORY_CHUNK_SIZE = 10000
+
+
+def forecast_weeks():
+    return getattr(settings, 'FORECAST_WEEKS', 26)
+
+
+def forecast_quantile():
+    return getattr(settings, 'FORECAST_QUANTILE', 0.9)
+
+
+def half_life_weeks():
+    return getattr(settings, 'FORECAST_HALF_LIFE_WEEKS', 8)
+
+
+def cache_timeout():
+    return getattr(settings, 'FORECAST_CACHE_TIMEOUT', 3600)
+
+
+def require_numpy():
+    if np is None:
+        raise ImproperlyConfigured('Demand forecasting needs NumPy, install it with pip install numpy.')
+
+
+def hour_label(hour_of_week):
+    return f'{WEEKDAYS[hour_of_week // 24]} {hour_of_week % 24:02d}:00'
+
+
+def window(weeks, now=None):
+    """The last ``weeks`` complete weeks, Monday 00:00 to Monday 00:00 local time."""
+    today = timezone.localdate(now)
+    end = timezone.make_aware(datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time()))
+    return end - timedelta(weeks=weeks), end
+
+
+def history(querysets, key_field, time_field):
+    """(keys, epoch seconds) arrays of every row of ``querysets``, all keys 0 without ``key_field``."""
+    key = key_field or Value(0, output_field=IntegerField())
+    rows = [
+        row for queryset in querysets
+        for row in queryset.values_list(key, time_field).iterator(chunk_size=HISTORY_CHUNK_SIZE)
+    ]
+    keys, times = zip(*rows) if rows else ((), ())
+    seconds = np.fromiter(map(datetime.timestamp, times), dtype=np.float64, count=len(times))
+    return np.fromiter(keys, dtype=np.int64, count=len(keys)), seconds
+
+
+def fit_profiles(keys, seconds, start, weeks, quantile, half_life):
+    """
+    Weighted hour-of-week demand per key. Returns the sorted unique keys and
+    two (keys, 168) arrays, the mean and the ``quantile`` level per hour.
+    Week w of ``weeks`` weighs 0.5 ** ((weeks - 1 - w) / half_life).
+    """
+    offset = timezone.localtime(start).utcoffset().total_seconds()
+    local = seconds + offset
+    # 1970-01-01 was a Thursday, shift so that hour 0 is Monday 00:00
+    hour_of_week = ((local // 3600 + 72) % HOURS_PER_WEEK).astype(np.int64)
+    week = ((seconds - start.timestamp()) // WEEK_SECONDS).astype(np.int64)
+    inside = (week >= 0) & (week < weeks)
+    ids, key_index = np.unique(keys[inside], return_inverse=True)
+    if not len(ids):
+        empty = np.zeros((0, HOURS_PER_WEEK))
+        return ids, empty, empty
+
+    # Count the rows of every (key, week, hour) cell that has any
+    flat = (key_index * weeks + week[inside]) * HOURS_PER_WEEK + hour_of_week[inside]
+    cells, counts = np.unique(flat, return_counts=True)
+    cell_week = cells // HOURS_PER_WEEK % weeks
+    group = cells // (weeks * HOURS_PER_WEEK) * HOURS_PER_WEEK + cells % HOURS_PER_WEEK
+    week_weights = 0.5 ** ((weeks - 1 - np.arange(weeks)) / half_life)
+    weights = week_weights[cell_week]
+    size = len(ids) * HOURS_PER_WEEK
+    # Weeks without rows in a cell count as zeros through the total weight
+    total = week_weights.sum()
+    shape = (len(ids), HOURS_PER_WEEK)
+    mean = np.bincount(group, weights=counts * weights, minlength=size).reshape(shape) / total
+    square = np.bincount(group, weights=counts ** 2 * weights, minlength=size).reshape(shape) / total
+    deviation = np.sqrt(np.maximum(square - mean ** 2, 0))
+    return ids, mean, mean + NormalDist().inv_cdf(quantile) * deviation
+
+
+def _profiles(ids, mean, high, slot_limit):
+    """One profile dict per key, in the order of ``ids``."""
+    suggested = np.maximum(1, np.ceil(high.max(axis=1) - 1e-9)).astype(np.int64)
+    return [
+        {
+            'weekly_mean': round(weekly, 2),
+            'peak_hour': hour_label(peak),
+            'suggested_slot_limit': limit,
+            'slot_limit': slot_limit,
+            'mean': hourly_mean,
+            'high': hourly_high,
+        }
+        for weekly, peak, limit, hourly_mean, hourly_high in zip(
+            mean.sum(axis=1).tolist(), high.argmax(axis=1).tolist(), suggested.tolist(),
+            mean.round(3).tolist(), high.round(3).tolist(),
+        )
+    ]
+
+
+def forecast_demand(depot_ids=None, pickups=True, weeks=None, quantile=None, now=None):
+    """
+    Hour-of-week profiles of the depots' bookings, all depots for
+    ``depot_ids`` None, and with ``pickups`` of the scheduled pickups. A
+    depot without bookings in the window has no profile.
+    """
+    require_numpy()
+    weeks = weeks or forecast_weeks()
+    quantile = quantile or forecast_quantile()
+    start, end = window(weeks, now)
+    result = {'start': start, 'end': end, 'weeks': weeks, 'quantile': quantile, 'depots': [], 'pickups': None}
+
+    if depot_ids != []:
+        bookings = [
+            model.objects.filter(booking_time__gte=start, booking_time__lt=end).exclude(status='CANCELLED')
+            for model in (ContainerBooking, ArchivedContainerBooking)
+        ]
+        if depot_ids is not None:
+            bookings = [queryset.filter(depot_id__in=depot_ids) for queryset in bookings]
+        keys, seconds = history(bookings, 'depot_id', 'booking_time')
+        ids, mean, high = fit_profiles(keys, seconds, start, weeks, quantile, half_life_weeks())
+        result['depots'] = [
+            {'depot_id': depot_id, **profile}
+            for depot_id, profile in zip(ids.tolist(), _profiles(ids, mean, high, DepotSlot.SLOT_LIMIT))
+        ]
+
+    if pickups:
+        scheduled = [
+            model.objects.filter(scheduled_pickup_time__gte=start, scheduled_pickup_time__lt=end)
+            for model in (Cargo, ArchivedCargo)
+        ]
+        keys, seconds = history(scheduled, None, 'scheduled_pickup_time')
+        ids, mean, high = fit_profiles(keys, seconds, start, weeks, quantile, half_life_weeks())
+        # Pickup slots are shared by all ports, so there is one profile
+        result['pickups'] = next(iter(_profiles(ids, mean, high, PickupSlot.SLOT_LIMIT)), None)
+    return result
+
+
+def cached_forecast(depot_ids=None, pickups=True, weeks=None, quantile=None):
+    """forecast_demand() kept in the cache for FORECAST_CACHE_TIMEOUT, the history only changes weekly."""
+    require_numpy()
+    weeks = weeks or forecast_weeks()
+    quantile = quantile or forecast_quantile()
+    depots = 'all' if depot_ids is None else ','.join(map(str, sorted(depot_ids)))
+    start, _ = window(weeks)
+    digest = hashlib.md5(f'{depots}:{pickups}:{weeks}:{quantile}:{start.isoformat()}'.encode()).hexdigest()
+    return cache.get_or_set(
+        f'forecast:{digest}', lambda: forecast_demand(depot_ids, pickups, weeks, quantile), cache_timeout()
+    )
@@ -3,7 +3,7 @@ from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.core.exceptions import ValidationError
 from datetime import datetime, timedelta
 from django.utils import timezone
-from .models import CustomUser, Cargo, ContainerBooking, DepotCapacity
+from .models import CustomUser, Cargo, ContainerBooking, DepotCapacity, DepotSlot, PickupSlot
 
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -50,6 +50,17 @@ class CargoForm(forms.ModelForm):
         model = Cargo
         fields = ['cargo_number', 'cargo_owner', 'storage', 'arrival_date', 'pickup_date']
 
+class CargoImportForm(forms.Form):
+    file = forms.FileField(
+        help_text='CSV with columns cargo_number, cargo_owner, storage, arrival_date, pickup_date (dates as YYYY-MM-DD)',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'})
+    )
+    upsert = forms.BooleanField(
+        required=False,
+        label='Update existing cargo with the same cargo number',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
 class ContainerBookingForm(forms.ModelForm):
     booking_time = forms.DateTimeField(
         widget=forms.DateTimeInput(attrs={
@@ -92,7 +103,7 @@ class ContainerBookingForm(forms.ModelForm):
 
         # Check time slot availability
         bookings_count = ContainerBooking.get_bookings_in_timeslot(depot, booking_time)
-        if bookings_count >= 3:
+        if bookings_count >= DepotSlot.SLOT_LIMIT:
             self.add_error('booking_time', 'This time slot is full (maximum 3 bookings per hour).')
 
         return cleaned_data
@@ -150,8 +161,8 @@ class PickupScheduleForm(forms.Form):
             if pickup_datetime < timezone.now():
                 raise forms.ValidationError('Cannot schedule pickup in the past')
 
-            # Check if slot is available
-            if Cargo.get_pickup_slot_count(pickup_datetime) >= 3:
+            # Check if slot is available; schedule_pickup reserves it atomically
+            if Cargo.get_pickup_slot_count(pickup_datetime) >= PickupSlot.SLOT_LIMIT:
                 raise forms.ValidationError('This time slot is fully booked. Please select another time.')
 
             cleaned_data['pickup_datetime'] = pickup_datetime
@@ -0,0 +1,164 @@
+import csv
+from collections import Counter
+from functools import partial
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .caching import bump_scope_versions
+from .events import publish_on_commit
+from .models import Cargo, Company, Tombstone
+from .stats import CARGO_STATS_FIELDS, apply_counts, cargo_counts, changed_counts, stats_values
+
+DEFAULT_BATCH_SIZE = 1000
+
+IMPORT_COLUMNS = ('cargo_number', 'cargo_owner', 'storage', 'arrival_date', 'pickup_date')
+UPDATE_FIELDS = ('cargo_owner', 'storage', 'arrival_date', 'pickup_date', 'owner_company', 'storage_company', 'updated_at')
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.errors.append({'row': row_number, 'error': message})
+
+    def as_dict(self):
+        return {'created': self.created, 'updated': self.updated, 'errors': self.errors}
+
+
+def _clean_row(row):
+    """Validate one CSV row against the Cargo field definitions."""
+    values = {}
+    for name in IMPORT_COLUMNS:
+        field = Cargo._meta.get_field(name)
+        raw = (row.get(name) or '').strip()
+        if not raw:
+            raise ValidationError(f'{name} is required.')
+        value = field.to_python(raw)
+        for validator in field.validators:
+            validator(value)
+        values[name] = value
+    return values
+
+
+def _existing(cleaned):
+    """One query for every cargo number of the batch that already exists."""
+    return {
+        row['cargo_number']: row
+        for row in Cargo.objects.filter(cargo_number__in=cleaned).values(
+            'cargo_number', 'id', 'owner_company_id', 'storage_company_id', *CARGO_STATS_FIELDS
+        )
+    }
+
+
+def _plan_batch(cleaned, existing, companies, port, upsert):
+    """The rows to create and update, tombstones, rollup counts and row errors of a batch."""
+    now = timezone.now()
+    to_create, to_update, tombstones, errors = [], [], [], []
+    # bulk_create and bulk_update send no signals, so count the rollups here
+    counts = Counter()
+    for number, (row_number, values) in cleaned.items():
+        cargo = Cargo(
+            port=port,
+            owner_company=companies.get(Company.normalize(values['cargo_owner'])),
+            storage_company=companies.get(Company.normalize(values['storage'])),
+            **values
+        )
+        if number not in existing:
+            to_create.append(cargo)
+            counts.update(cargo_counts(stats_values(cargo, CARGO_STATS_FIELDS)))
+        elif not upsert:
+            errors.append((row_number, f'Cargo {number} already exists.'))
+        elif existing[number]['port_id'] != port.pk:
+            errors.append((row_number, f'Cargo {number} belongs to another port.'))
+        else:
+            old = existing[number]
+            cargo.pk = old['id']
+            cargo.is_picked_up = old['is_picked_up']
+            cargo.updated_at = now
+            to_update.append(cargo)
+            counts.update(changed_counts(cargo_counts, old, stats_values(cargo, CARGO_STATS_FIELDS)))
+            # Sync clients of the previous owner or storage drop the cargo
+            for scope, old_id, new_id in (('owner', old['owner_company_id'], cargo.owner_company_id),
+                                          ('storage', old['storage_company_id'], cargo.storage_company_id)):
+                if old_id is not None and old_id != new_id:
+                    tombstones.append(Tombstone(kind='cargo', object_id=cargo.pk, scope=f'{scope}:{old_id}'))
+    return to_create, to_update, tombstones, counts, errors
+
+
+def _import_batch(batch, port, upsert, result):
+    cleaned = {}
+    for row_number, row in batch:
+        try:
+            values = _clean_row(row)
+        except ValidationError as e:
+            result.add_error(row_number, '; '.join(e.messages))
+            continue
+        if values['cargo_number'] in cleaned:
+            result.add_error(row_number, f'Duplicate cargo number {values["cargo_number"]} in file.')
+            continue
+        cleaned[values['cargo_number']] = (row_number, values)
+    if not cleaned:
+        return set()
+
+    companies = Company.resolve_many(
+        name for _, values in cleaned.values() for name in (values['cargo_owner'], values['storage'])
+    )
+    while True:
+        try:
+            with transaction.atomic():
+                # Checked in the writing transaction, so a retry sees what collided
+                existing = _existing(cleaned)
+                to_create, to_update, tombstones, counts, errors = _plan_batch(cleaned, existing, companies, port, upsert)
+                Cargo.objects.bulk_create(to_create)
+                Cargo.objects.bulk_update(to_update, UPDATE_FIELDS)
+                Tombstone.objects.bulk_create(tombstones)
+                apply_counts(counts)
+            break
+        except IntegrityError:
+            # Retry when a cargo number was inserted concurrently since the
+            # check, the retry reports it as existing or updates it. Every
+            # retry moves at least one row out of to_create.
+            if not Cargo.objects.filter(cargo_number__in=[cargo.cargo_number for cargo in to_create]).exists():
+                raise
+    for row_number, message in errors:
+        result.add_error(row_number, message)
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+    scopes = {f'port:{port.pk}'}
+    for cargo in to_create + to_update:
+        scopes.update({f'owner:{cargo.owner_company_id}', f'storage:{cargo.storage_company_id}'})
+    return scopes
+
+
+def import_cargo(lines, port, upsert=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import cargo for ``port`` from an iterable of CSV lines with the
+    IMPORT_COLUMNS header. Rows are parsed lazily and written in batches with
+    bulk_create/bulk_update, each batch in its own transaction. Invalid rows
+    are reported in the result without aborting the rest of the import.
+    """
+    result = ImportResult()
+    reader = csv.DictReader(lines)
+    missing = [name for name in IMPORT_COLUMNS if name not in (reader.fieldnames or [])]
+    if missing:
+        result.add_error(1, f'Missing columns: {", ".join(missing)}.')
+        return result
+
+    # Row 1 is the header
+    rows = enumerate(reader, start=2)
+    scopes = set()
+    while batch := list(islice(rows, batch_size)):
+        scopes |= _import_batch(batch, port, upsert, result)
+    # bulk_create and bulk_update do not send post_save, so invalidate and
+    # notify here
+    transaction.on_commit(partial(bump_scope_versions, *scopes))
+    if result.created or result.updated:
+        publish_on_commit(scopes, {'type': 'cargo.imported', 'created': result.created, 'updated': result.updated})
+    return result
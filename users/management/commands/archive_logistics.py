@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from users.archive import archive_logistics
+
+
+class Command(BaseCommand):
+    help = 'Move cargo picked up and bookings finished long ago into the archive tables, in short batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, help='Age in days, ARCHIVE_AFTER_DAYS by default.')
+        parser.add_argument('--batch-size', type=int, help='Rows per transaction, ARCHIVE_BATCH_SIZE by default.')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+        parser.add_argument('--limit', type=int, help='Stop after this many rows per table.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be archived.')
+
+    def handle(self, *args, **options):
+        counts = archive_logistics(
+            options['older_than'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            limit=options['limit'],
+            dry_run=options['dry_run'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(f'{verb} {counts["cargo"]} cargo and {counts["bookings"]} bookings.')
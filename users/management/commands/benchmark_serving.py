@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.benchmarks import SERVING_PATHS, run_serving_benchmark
+from users.seeding import DEFAULT_PASSWORD
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent throughput of the driver read paths under the WSGI and the ASGI handler.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help=f'Paths to request, by default: {", ".join(SERVING_PATHS)}.')
+        parser.add_argument('--prefix', default='SEED', help='Prefix the world was seeded with.')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per path and handler.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at once.')
+        parser.add_argument('--host', default='localhost', help='Host header, must be in ALLOWED_HOSTS.')
+        parser.add_argument('--label', help='Free-text label stored with the results.')
+        parser.add_argument('--output', '-o', help='Write the JSON results to this file.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be at least 1.')
+        try:
+            results = run_serving_benchmark(
+                options['prefix'], options['paths'] or None, options['requests'], options['concurrency'],
+                options['host'], options['password'], options['label'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.benchmarks import CONTENTION_FLOWS, FLOWS, run_contention_benchmark
+from users.seeding import DEFAULT_PASSWORD
+
+
+class Command(BaseCommand):
+    help = ('Run the write flows and a reader at the same time with default SQLite settings, then with the '
+            'configured pragmas, BEGIN IMMEDIATE and lock retries, and report both as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('flows', nargs='*', help=f'Flows to run together, by default: {", ".join(CONTENTION_FLOWS)}.')
+        parser.add_argument('--prefix', default='SEED', help='Prefix the world was seeded with.')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per flow and profile.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Threads per flow.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--host', default='localhost', help='Host header, must be in ALLOWED_HOSTS.')
+        parser.add_argument('--label', help='Free-text label stored with the results.')
+        parser.add_argument('--output', '-o', help='Write the JSON results to this file.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be at least 1.')
+        unknown = set(options['flows']) - set(FLOWS)
+        if unknown:
+            raise CommandError(f'Unknown flows: {", ".join(sorted(unknown))}.')
+        try:
+            results = run_contention_benchmark(
+                options['prefix'], options['flows'] or None, options['requests'], options['concurrency'],
+                options['seed'], options['host'], options['password'], options['label'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
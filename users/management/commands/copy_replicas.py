@@ -0,0 +1,18 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from users.routers import copy_to_replicas
+
+
+class Command(BaseCommand):
+    help = 'Copy the default SQLite database over each of DATABASE_REPLICAS, the local stand-in for replication.'
+
+    def handle(self, *args, **options):
+        try:
+            copied = copy_to_replicas()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        if not copied:
+            self.stdout.write('No replicas configured, set DATABASE_REPLICAS.')
+            return
+        self.stdout.write(f'Copied the primary to: {", ".join(copied)}.')
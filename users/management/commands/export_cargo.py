@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.exports import (
+    DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, STATUS_FLAGS, manifest_lines, manifest_rows, parse_manifest_filters,
+)
+
+
+class Command(BaseCommand):
+    help = 'Stream the cargo manifest to stdout or a file as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--from', dest='from', help='First arrival date to include (YYYY-MM-DD).')
+        parser.add_argument('--to', help='Last arrival date to include (YYYY-MM-DD).')
+        parser.add_argument('--port', help='Only export cargo of this port user id.')
+        for flag in STATUS_FLAGS:
+            parser.add_argument(f'--{flag.replace("_", "-")}', dest=flag, choices=['true', 'false'])
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--output', '-o', help='Write to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_manifest_filters(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        lines = manifest_lines(options['format'], manifest_rows(filters, options['chunk_size']))
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
@@ -0,0 +1,46 @@
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from users.forecasting import forecast_demand
+
+
+class Command(BaseCommand):
+    help = 'Fit hour-of-week booking and pickup demand profiles and suggest slot limits.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depot', type=int, action='append', dest='depots', help='Depot user id, repeatable.')
+        parser.add_argument('--no-pickups', action='store_true', help='Skip the pickup window profile.')
+        parser.add_argument('--weeks', type=int, help='Complete weeks of history, FORECAST_WEEKS by default.')
+        parser.add_argument('--quantile', type=float, help='Demand level to plan for, FORECAST_QUANTILE by default.')
+        parser.add_argument('--json', action='store_true', help='Write the full profiles as JSON.')
+
+    def handle(self, *args, **options):
+        if options['weeks'] is not None and options['weeks'] < 1:
+            raise CommandError('--weeks must be at least 1.')
+        if options['quantile'] is not None and not 0.5 <= options['quantile'] < 1:
+            raise CommandError('--quantile must be at least 0.5 and below 1.')
+        try:
+            forecast = forecast_demand(
+                options['depots'], not options['no_pickups'], options['weeks'], options['quantile']
+            )
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        if options['json']:
+            self.stdout.write(json.dumps(forecast, cls=DjangoJSONEncoder, indent=2))
+            return
+        self.stdout.write(
+            f'{forecast["weeks"]} weeks from {forecast["start"]:%Y-%m-%d}, planning for the {forecast["quantile"]:.0%} level'
+        )
+        self.stdout.write(f'{"profile":<14} {"per week":>9}  {"peak hour":<10} {"suggested":>9} {"limit":>6}')
+        rows = [(f'depot {profile["depot_id"]}', profile) for profile in forecast['depots']]
+        if forecast['pickups']:
+            rows.append(('pickups', forecast['pickups']))
+        for label, profile in rows:
+            self.stdout.write(
+                f'{label:<14} {profile["weekly_mean"]:>9.1f}  {profile["peak_hour"]:<10} '
+                f'{profile["suggested_slot_limit"]:>9} {profile["slot_limit"]:>6}'
+            )
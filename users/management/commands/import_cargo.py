@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.imports import DEFAULT_BATCH_SIZE, import_cargo
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Bulk import cargo for a port from a CSV manifest.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with cargo_number, cargo_owner, storage, arrival_date, pickup_date columns.')
+        parser.add_argument('--port', required=True, help='Email or id of the port user that owns the cargo.')
+        parser.add_argument('--upsert', action='store_true', help='Update cargo that already exists instead of reporting it.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        lookup = {'pk': options['port']} if options['port'].isdigit() else {'email': options['port']}
+        try:
+            port = CustomUser.objects.get(user_type='PORT', **lookup)
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'No port user {options["port"]}.')
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as lines:
+                result = import_cargo(lines, port, upsert=options['upsert'], batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in result.errors:
+            self.stderr.write(f'Row {error["row"]}: {error["error"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.created} created, {result.updated} updated, {len(result.errors)} rejected.'
+        ))
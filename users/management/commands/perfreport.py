@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from users.profiling import METRICS, report
+
+
+class Command(BaseCommand):
+    help = 'Show sampled query count and latency percentiles per URL name.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Only report these URL names.')
+        parser.add_argument('--sort', choices=['samples', *METRICS], default='samples')
+        parser.add_argument('--json', action='store_true', help='Print the raw report as JSON.')
+
+    def handle(self, *args, **options):
+        entries = report(options['names'] or None)
+        if options['sort'] != 'samples':
+            entries.sort(key=lambda e: -(e[options['sort']]['p95'] or 0))
+        if options['json']:
+            self.stdout.write(json.dumps(entries, indent=2))
+            return
+        if not entries:
+            self.stdout.write('No samples. Set PROFILING_SAMPLE_RATE and use a shared cache backend.')
+            return
+
+        header = f'{"view":<32} {"samples":>7} {"n+1":>5}' + ''.join(f' {metric + " p50/p95/p99":>26}' for metric in METRICS)
+        self.stdout.write(header)
+        for entry in entries:
+            line = f'{entry["name"]:<32} {entry["samples"]:>7} {entry["n_plus_one"]:>5}'
+            for metric in METRICS:
+                line += ' {:>26}'.format('/'.join(f'{entry[metric][p]:g}' for p in ('p50', 'p95', 'p99')))
+            self.stdout.write(line)
+        for entry in entries:
+            for example in entry['repeated_queries']:
+                self.stdout.write(self.style.WARNING(f'{entry["name"]}: {example["count"]}x {example["sql"]}'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from users.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete delta-sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Deleted {prune_tombstones()} tombstones.')
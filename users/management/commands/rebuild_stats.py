@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the depot and port rollup statistics from the booking and cargo tables.'
+
+    def handle(self, *args, **options):
+        counts = rebuild_stats()
+        self.stdout.write(f'Rebuilt {counts["depot_hours"]} depot hour and {counts["port_days"]} port day rows.')
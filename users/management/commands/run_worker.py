@@ -0,0 +1,41 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from users.taskqueue import load_tasks, start_workers
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks from the database queue until interrupted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Worker loops to run.')
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread',
+                            help='Run the loops as threads, or as processes for CPU-bound tasks.')
+        parser.add_argument('--batch-size', type=int, help='Tasks claimed at a time, TASK_BATCH_SIZE by default.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when no task is due.')
+        parser.add_argument('--once', action='store_true', help='Exit when no task is due instead of polling.')
+
+    def handle(self, *args, **options):
+        load_tasks()
+        stop, workers = start_workers(
+            options['concurrency'],
+            options['pool'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+        )
+
+        def shut_down(signum, frame):
+            # Workers finish the task in hand and give the rest of their batch back
+            self.stdout.write('Stopping workers...')
+            stop.set()
+
+        signal.signal(signal.SIGINT, shut_down)
+        signal.signal(signal.SIGTERM, shut_down)
+        self.stdout.write(f'Started {len(workers)} {options["pool"]} workers.')
+        while any(worker.is_alive() for worker in workers):
+            # Join with a timeout so the signal handlers get to run
+            for worker in workers:
+                worker.join(0.5)
+        self.stdout.write('Workers stopped.')
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.seeding import DEFAULT_PASSWORD, seed_world
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate a reproducible logistics world for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='SEED', help='Prefix of seeded emails, companies and cargo numbers.')
+        parser.add_argument('--ports', type=int, default=5)
+        parser.add_argument('--cfs', type=int, default=10)
+        parser.add_argument('--depots', type=int, default=10)
+        parser.add_argument('--drivers', type=int, default=50)
+        parser.add_argument('--owners', type=int, default=20, help='Number of cargo owner companies.')
+        parser.add_argument('--cargo', type=int, default=100000)
+        parser.add_argument('--bookings', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=365, help='Days of history to spread cargo and bookings over.')
+        parser.add_argument('--depot-capacity', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same data.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password of every seeded user.')
+
+    def handle(self, *args, **options):
+        if options['owners'] < 1:
+            raise CommandError('--owners must be at least 1.')
+        try:
+            counts = seed_world(
+                prefix=options['prefix'], ports=options['ports'], cfs=options['cfs'], depots=options['depots'],
+                drivers=options['drivers'], owners=options['owners'], cargo=options['cargo'],
+                bookings=options['bookings'], days=options['days'], depot_capacity=options['depot_capacity'],
+                seed=options['seed'], batch_size=options['batch_size'], password=options['password'],
+                log=self.stderr.write if options['verbosity'] > 1 else None,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {counts["users"]} users, {counts["cargo"]} cargo and {counts["bookings"]} bookings.'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_containerbooking'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='containerbooking',
+            name='container_number',
+            field=models.CharField(default='1', max_length=100),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:52
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+
+def backfill_pickup_slots(apps, schema_editor):
+    Cargo = apps.get_model('users', 'Cargo')
+    PickupSlot = apps.get_model('users', 'PickupSlot')
+    slots = (
+        Cargo.objects.filter(scheduled_pickup_time__isnull=False)
+        .annotate(slot_start=TruncHour('scheduled_pickup_time'))
+        .order_by()
+        .values('slot_start')
+        .annotate(booked=Count('id'))
+    )
+    PickupSlot.objects.bulk_create(
+        [PickupSlot(slot_start=row['slot_start'], booked=row['booked']) for row in slots],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_alter_containerbooking_container_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PickupSlot',
+            fields=[
+                ('slot_start', models.DateTimeField(primary_key=True, serialize=False)),
+                ('booked', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['slot_start'],
+            },
+        ),
+        migrations.RunPython(backfill_pickup_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+
+def backfill_reservations(apps, schema_editor):
+    ContainerBooking = apps.get_model('users', 'ContainerBooking')
+    DepotCapacity = apps.get_model('users', 'DepotCapacity')
+    DepotSlot = apps.get_model('users', 'DepotSlot')
+    active = ContainerBooking.objects.filter(status__in=['PENDING', 'CONFIRMED']).order_by()
+
+    for row in active.values('depot').annotate(booked=Count('id')):
+        capacity, _ = DepotCapacity.objects.get_or_create(depot_id=row['depot'], defaults={'total_capacity': 1})
+        capacity.active_bookings = row['booked']
+        capacity.save(update_fields=['active_bookings'])
+
+    slots = (
+        active.annotate(slot_start=TruncHour('booking_time'))
+        .values('depot', 'slot_start')
+        .annotate(booked=Count('id'))
+    )
+    DepotSlot.objects.bulk_create(
+        [DepotSlot(depot_id=row['depot'], slot_start=row['slot_start'], booked=row['booked']) for row in slots],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_pickupslot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='depotcapacity',
+            name='active_bookings',
+            field=models.PositiveIntegerField(default=0, help_text='Number of pending and confirmed bookings'),
+        ),
+        migrations.CreateModel(
+            name='DepotSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_start', models.DateTimeField()),
+                ('booked', models.PositiveIntegerField(default=0)),
+                ('depot', models.ForeignKey(limit_choices_to={'user_type': 'DEPOT'}, on_delete=django.db.models.deletion.CASCADE, related_name='depot_slots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['slot_start'],
+                'constraints': [models.UniqueConstraint(fields=('depot', 'slot_start'), name='unique_depot_slot')],
+            },
+        ),
+        migrations.RunPython(backfill_reservations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_depotslot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cargo',
+            index=models.Index(fields=['port', '-created_at', '-id'], name='cargo_port_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cargo',
+            index=models.Index(condition=models.Q(('is_picked_up', False)), fields=['driver', 'scheduled_pickup_time', 'id'], name='cargo_driver_scheduled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cargo',
+            index=models.Index(condition=models.Q(('is_picked_up', True)), fields=['driver', '-scheduled_pickup_time', '-id'], name='cargo_driver_picked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cargo',
+            index=models.Index(condition=models.Q(('driver__isnull', True)), fields=['-created_at', '-id'], name='cargo_unassigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cargo',
+            index=models.Index(fields=['scheduled_pickup_time'], name='cargo_scheduled_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='containerbooking',
+            index=models.Index(fields=['driver', '-booking_time'], name='booking_driver_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='containerbooking',
+            index=models.Index(fields=['depot', 'status', 'booking_time'], name='booking_depot_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='containerbooking',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'CONFIRMED'])), fields=['depot', 'booking_time'], name='booking_depot_active_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Company',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('key', models.CharField(editable=False, max_length=200, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Companies',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='cargo',
+            name='cargo_unassigned_idx',
+        ),
+        migrations.AddField(
+            model_name='cargo',
+            name='owner_company',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='owned_cargos', to='users.company'),
+        ),
+        migrations.AddField(
+            model_name='cargo',
+            name='storage_company',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stored_cargos', to='users.company'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='company',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='users.company'),
+        ),
+        migrations.AddIndex(
+            model_name='cargo',
+            index=models.Index(condition=models.Q(('driver__isnull', True)), fields=['owner_company', '-created_at', '-id'], name='cargo_unassigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cargo',
+            index=models.Index(fields=['storage_company', '-created_at', '-id'], name='cargo_storage_created_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+def normalize(name):
+    return ' '.join((name or '').split()).lower()
+
+
+def backfill_companies(apps, schema_editor):
+    Company = apps.get_model('users', 'Company')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Cargo = apps.get_model('users', 'Cargo')
+
+    companies = {}
+
+    def resolve(name):
+        key = normalize(name)
+        if not key:
+            return None
+        if key not in companies:
+            companies[key], _ = Company.objects.get_or_create(key=key, defaults={'name': ' '.join(name.split())})
+        return companies[key]
+
+    # One UPDATE per distinct free-text value rather than one per row
+    for name in CustomUser.objects.order_by().values_list('company_name', flat=True).distinct():
+        company = resolve(name)
+        if company:
+            CustomUser.objects.filter(company_name=name).update(company=company)
+    for name in Cargo.objects.order_by().values_list('cargo_owner', flat=True).distinct():
+        company = resolve(name)
+        if company:
+            Cargo.objects.filter(cargo_owner=name).update(owner_company=company)
+    for name in Cargo.objects.order_by().values_list('storage', flat=True).distinct():
+        company = resolve(name)
+        if company:
+            Cargo.objects.filter(storage=name).update(storage_company=company)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_company'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_companies, migrations.RunPython.noop),
+    ]
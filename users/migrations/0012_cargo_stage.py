@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:03
+
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+
+def backfill_stage(apps, schema_editor):
+    Cargo = apps.get_model('users', 'Cargo')
+    # Same order as Cargo.STAGE_MILESTONES, inlined for the historical model
+    Cargo.objects.update(stage=Case(
+        When(is_picked_up=True, then=Value('PICKED_UP')),
+        When(cfs_picked_up=True, then=Value('CFS_RELEASED')),
+        When(driver__isnull=False, then=Value('SCHEDULED')),
+        When(cfs_received=True, then=Value('CFS_RECEIVED')),
+        When(arrived_at_storage=True, then=Value('AT_STORAGE')),
+        default=Value('REGISTERED'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_backfill_companies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cargo',
+            name='stage',
+            field=models.CharField(choices=[('REGISTERED', 'Registered'), ('AT_STORAGE', 'At Storage'), ('CFS_RECEIVED', 'Received at CFS'), ('SCHEDULED', 'Pickup Scheduled'), ('CFS_RELEASED', 'Released by CFS'), ('PICKED_UP', 'Picked Up')], default='REGISTERED', editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_stage, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cargo',
+            index=models.Index(fields=['port', 'stage', '-created_at', '-id'], name='cargo_port_stage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cargo',
+            index=models.Index(fields=['storage_company', 'stage', '-created_at', '-id'], name='cargo_storage_stage_idx'),
+        ),
+    ]
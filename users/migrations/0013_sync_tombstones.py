@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_cargo_stage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('cargo', 'Cargo'), ('booking', 'Container booking')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('scope', models.CharField(max_length=50)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='cargo',
+            index=models.Index(fields=['owner_company', 'updated_at', 'id'], name='cargo_owner_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cargo',
+            index=models.Index(fields=['driver', 'updated_at', 'id'], name='cargo_driver_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='containerbooking',
+            index=models.Index(fields=['driver', 'updated_at', 'id'], name='booking_driver_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['scope', 'deleted_at', 'id'], name='tombstone_scope_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCargo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('cargo_number', models.CharField(db_index=True, max_length=100)),
+                ('cargo_owner', models.CharField(max_length=200)),
+                ('storage', models.CharField(max_length=200)),
+                ('arrival_date', models.DateField()),
+                ('pickup_date', models.DateField()),
+                ('scheduled_pickup_time', models.DateTimeField(blank=True, null=True)),
+                ('arrived_at_storage', models.BooleanField(default=False)),
+                ('is_picked_up', models.BooleanField(default=True)),
+                ('cfs_received', models.BooleanField(default=False)),
+                ('cfs_picked_up', models.BooleanField(default=False)),
+                ('stage', models.CharField(choices=[('REGISTERED', 'Registered'), ('AT_STORAGE', 'At Storage'), ('CFS_RECEIVED', 'Received at CFS'), ('SCHEDULED', 'Pickup Scheduled'), ('CFS_RELEASED', 'Released by CFS'), ('PICKED_UP', 'Picked Up')], default='PICKED_UP', max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('cfs', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_cfs_cargos', to=settings.AUTH_USER_MODEL)),
+                ('driver', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_driver_cargos', to=settings.AUTH_USER_MODEL)),
+                ('owner_company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_owned_cargos', to='users.company')),
+                ('port', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_port_cargos', to=settings.AUTH_USER_MODEL)),
+                ('storage_company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_stored_cargos', to='users.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['driver', '-scheduled_pickup_time', '-id'], name='archived_cargo_driver_idx'), models.Index(fields=['port', 'id'], name='archived_cargo_port_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedContainerBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('booking_time', models.DateTimeField()),
+                ('container_number', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('CONFIRMED', 'Confirmed'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('depot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_depot_bookings', to=settings.AUTH_USER_MODEL)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_container_bookings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['driver', '-booking_time', '-id'], name='archived_booking_driver_idx')],
+            },
+        ),
+    ]
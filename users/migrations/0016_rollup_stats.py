@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepotHourStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('pending', models.IntegerField(default=0)),
+                ('confirmed', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('depot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='depot_hour_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Depot hour stats',
+                'constraints': [models.UniqueConstraint(fields=('depot', 'hour'), name='unique_depot_hour_stats')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PortDayStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('arrivals', models.IntegerField(default=0)),
+                ('pickups', models.IntegerField(default=0)),
+                ('dwell_days', models.IntegerField(default=0)),
+                ('port', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='port_day_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Port day stats',
+                'constraints': [models.UniqueConstraint(fields=('port', 'day'), name='unique_port_day_stats')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_rollup_stats'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='containerbooking',
+            name='booking_driver_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='containerbooking',
+            name='booking_depot_active_idx',
+        ),
+        migrations.AddIndex(
+            model_name='containerbooking',
+            index=models.Index(fields=['driver', '-booking_time', '-id'], name='booking_driver_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='containerbooking',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'CONFIRMED'])), fields=['depot', 'booking_time', 'id'], name='booking_depot_active_idx'),
+        ),
+    ]
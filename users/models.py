@@ -1,6 +1,47 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
-from datetime import timedelta
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import BooleanField, Case, ExpressionWrapper, F, Func, Q, Value, When
+from django.utils import timezone
+
+class Company(models.Model):
+    """
+    A company referenced by name from users and cargo. Visibility rules join
+    on this table instead of substring-matching the free-text names.
+    """
+    name = models.CharField(max_length=200)
+    key = models.CharField(max_length=200, unique=True, editable=False)
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def normalize(name):
+        return ' '.join((name or '').split()).lower()
+
+    @classmethod
+    def resolve(cls, name):
+        """Return the company for a free-text name, creating it if needed."""
+        key = cls.normalize(name)
+        if not key:
+            return None
+        company, _ = cls.objects.get_or_create(key=key, defaults={'name': ' '.join(name.split())})
+        return company
+
+    @classmethod
+    def resolve_many(cls, names):
+        """Resolve many names at once. Returns {normalized key: company}."""
+        wanted = {cls.normalize(name): ' '.join(name.split()) for name in names if cls.normalize(name)}
+        companies = {company.key: company for company in cls.objects.filter(key__in=wanted)}
+        missing = [cls(key=key, name=name) for key, name in wanted.items() if key not in companies]
+        if missing:
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            companies.update((company.key, company) for company in cls.objects.filter(key__in=[c.key for c in missing]))
+        return companies
+
+    class Meta:
+        verbose_name_plural = 'Companies'
+        ordering = ['name']
 
 class CustomUser(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -14,11 +55,69 @@ class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=15, blank=True)
     company_name = models.CharField(max_length=100, blank=True)
+    company = models.ForeignKey(Company, on_delete=models.SET_NULL, related_name='users', null=True, blank=True)
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'user_type']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Keep the company link in step with the free-text name
+        if kwargs.get('update_fields') is None:
+            loaded = getattr(self, '_loaded_values', {})
+            if self.company_id is None or loaded.get('company_name') != self.company_name:
+                self.company = Company.resolve(self.company_name)
+        super().save(*args, **kwargs)
+        self._loaded_values = {'company_name': self.company_name}
+
+class CargoQuerySet(models.QuerySet):
+    def owned_by(self, company):
+        """Cargo whose owner is the given company (or company id)."""
+        if company is None:
+            return self.none()
+        return self.filter(owner_company=company)
+
+    def stored_at(self, company):
+        """Cargo held in storage by the given company (or company id)."""
+        if company is None:
+            return self.none()
+        return self.filter(storage_company=company)
+
+    def available_to(self, driver):
+        """Unassigned cargo of the driver's company."""
+        return self.owned_by(driver.company_id).filter(driver__isnull=True, is_picked_up=False)
+
+    def scheduled_for(self, driver):
+        return self.filter(driver=driver, is_picked_up=False)
+
+    def picked_up_by(self, driver):
+        return self.filter(driver=driver, is_picked_up=True)
+
 class Cargo(models.Model):
+    STAGE_CHOICES = (
+        ('REGISTERED', 'Registered'),
+        ('AT_STORAGE', 'At Storage'),
+        ('CFS_RECEIVED', 'Received at CFS'),
+        ('SCHEDULED', 'Pickup Scheduled'),
+        ('CFS_RELEASED', 'Released by CFS'),
+        ('PICKED_UP', 'Picked Up'),
+    )
+    # Latest stage first: the stage is the latest milestone that is reached.
+    # Each milestone is a status field, or the driver assignment for SCHEDULED.
+    STAGE_MILESTONES = (
+        ('PICKED_UP', 'is_picked_up'),
+        ('CFS_RELEASED', 'cfs_picked_up'),
+        ('SCHEDULED', 'driver'),
+        ('CFS_RECEIVED', 'cfs_received'),
+        ('AT_STORAGE', 'arrived_at_storage'),
+    )
+    STATUS_FIELDS = ('arrived_at_storage', 'cfs_received', 'cfs_picked_up', 'is_picked_up')
+
     cargo_number = models.CharField(max_length=100, unique=True)
     cargo_owner = models.CharField(max_length=200)
     storage = models.CharField(max_length=200)
@@ -34,32 +133,216 @@ class Cargo(models.Model):
     driver = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, limit_choices_to={'user_type': 'DRIVER'}, related_name='driver_cargos', null=True, blank=True)
     cfs_received = models.BooleanField(default=False)
     cfs_picked_up = models.BooleanField(default=False)
+    owner_company = models.ForeignKey(Company, on_delete=models.SET_NULL, related_name='owned_cargos', null=True, blank=True)
+    storage_company = models.ForeignKey(Company, on_delete=models.SET_NULL, related_name='stored_cargos', null=True, blank=True)
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default='REGISTERED', editable=False)
+
+    objects = CargoQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.cargo_number} - {self.cargo_owner}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        # The reloaded values are what the next save changes
+        refreshed = {
+            field.attname for field in self._meta.concrete_fields
+            if fields is None or field.name in fields or field.attname in fields
+        }
+        self._loaded_values = {
+            **getattr(self, '_loaded_values', {}),
+            **{name: self.__dict__[name] for name in refreshed if name in self.__dict__},
+        }
+
+    @classmethod
+    def milestone_reached(cls, values, milestone):
+        if milestone == 'driver':
+            return values.get('driver_id') is not None
+        return bool(values.get(milestone))
+
+    @classmethod
+    def compute_stage(cls, values):
+        """Stage for a mapping of field attnames to values."""
+        for stage, milestone in cls.STAGE_MILESTONES:
+            if cls.milestone_reached(values, milestone):
+                return stage
+        return 'REGISTERED'
+
+    @classmethod
+    def stage_for_milestone(cls, milestone):
+        return dict((m, stage) for stage, m in cls.STAGE_MILESTONES)[milestone]
+
+    @classmethod
+    def stage_expression(cls, **overrides):
+        """
+        SQL expression computing the stage of each row, for set-based updates.
+        ``overrides`` gives milestone values that the same UPDATE is setting.
+        """
+        whens = []
+        for stage, milestone in cls.STAGE_MILESTONES:
+            if milestone in overrides:
+                if overrides[milestone]:
+                    return Case(*whens, default=Value(stage))
+                continue
+            condition = Q(driver__isnull=False) if milestone == 'driver' else Q(**{milestone: True})
+            whens.append(When(condition, then=Value(stage)))
+        return Case(*whens, default=Value('REGISTERED'))
+
+    @classmethod
+    def check_transition(cls, stage, milestone, value):
+        """
+        Milestones can be reached in any order, but only the latest one can be
+        undone: a cargo released by the CFS cannot go back to not received.
+        """
+        if not value and stage != cls.stage_for_milestone(milestone):
+            label = cls._meta.get_field(milestone).verbose_name if milestone != 'driver' else 'pickup schedule'
+            raise ValidationError(
+                f'Cannot undo {label} once the cargo is {dict(cls.STAGE_CHOICES)[stage]}.'
+            )
+
+    def current_values(self):
+        return {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+
+    def set_status(self, field, value):
+        """Change one status flag through the stage state machine."""
+        if field not in self.STATUS_FIELDS:
+            raise ValidationError(f'Invalid status field {field}.')
+        if getattr(self, field) == value:
+            return
+        self.check_transition(self.stage, field, value)
+        setattr(self, field, value)
+        self.stage = self.compute_stage(self.current_values())
+
+    def clean(self):
+        # Validate flag changes made outside set_status, e.g. in the admin
+        loaded = getattr(self, '_loaded_values', None)
+        if not loaded:
+            return
+        stage = self.compute_stage(loaded)
+        current = self.current_values()
+        for _, milestone in self.STAGE_MILESTONES:
+            if self.milestone_reached(loaded, milestone) and not self.milestone_reached(current, milestone):
+                self.check_transition(stage, milestone, False)
+
+    def save(self, *args, **kwargs):
+        # Keep the company links in step with the free-text owner and storage
+        if kwargs.get('update_fields') is None:
+            loaded = getattr(self, '_loaded_values', {})
+            if self.owner_company_id is None or loaded.get('cargo_owner') != self.cargo_owner:
+                self.owner_company = Company.resolve(self.cargo_owner)
+            if self.storage_company_id is None or loaded.get('storage') != self.storage:
+                self.storage_company = Company.resolve(self.storage)
+            self.stage = self.compute_stage(self.current_values())
+        super().save(*args, **kwargs)
+        self._loaded_values = self.current_values()
+
     @classmethod
     def get_pickup_slot_count(cls, pickup_time):
-        from django.utils import timezone
-        start_time = pickup_time.replace(second=0, microsecond=0)
-        end_time = start_time + timezone.timedelta(minutes=59, seconds=59)
-        return cls.objects.filter(scheduled_pickup_time__range=(start_time, end_time)).count()
+        return PickupSlot.get_booked_count(pickup_time)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Port cargo list and dashboard
+            models.Index(fields=['port', '-created_at', '-id'], name='cargo_port_created_idx'),
+            # Driver scheduled and picked up lists. The boolean lives in the
+            # index condition because Django filters on it as NOT is_picked_up,
+            # which cannot match a leading index column.
+            models.Index(
+                fields=['driver', 'scheduled_pickup_time', 'id'],
+                name='cargo_driver_scheduled_idx',
+                condition=Q(is_picked_up=False),
+            ),
+            models.Index(
+                fields=['driver', '-scheduled_pickup_time', '-id'],
+                name='cargo_driver_picked_idx',
+                condition=Q(is_picked_up=True),
+            ),
+            # Per-stage counts and work queues for a port or a CFS
+            models.Index(fields=['port', 'stage', '-created_at', '-id'], name='cargo_port_stage_idx'),
+            models.Index(fields=['storage_company', 'stage', '-created_at', '-id'], name='cargo_storage_stage_idx'),
+            # Unassigned cargo offered to the owner's drivers
+            models.Index(
+                fields=['owner_company', '-created_at', '-id'],
+                name='cargo_unassigned_idx',
+                condition=Q(driver__isnull=True),
+            ),
+            # CFS dashboard
+            models.Index(fields=['storage_company', '-created_at', '-id'], name='cargo_storage_created_idx'),
+            models.Index(fields=['scheduled_pickup_time'], name='cargo_scheduled_time_idx'),
+            # Delta sync of the owner's and the driver's cargo
+            models.Index(fields=['owner_company', 'updated_at', 'id'], name='cargo_owner_updated_idx'),
+            models.Index(fields=['driver', 'updated_at', 'id'], name='cargo_driver_updated_idx'),
+        ]
+
+class PickupSlot(models.Model):
+    """Ledger of scheduled cargo pickups, one row per hourly slot."""
+    SLOT_LIMIT = 3
+
+    slot_start = models.DateTimeField(primary_key=True)
+    booked = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.slot_start:%Y-%m-%d %H:00}: {self.booked}/{self.SLOT_LIMIT}"
+
+    @staticmethod
+    def slot_for(pickup_time):
+        return pickup_time.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def get_booked_count(cls, pickup_time):
+        booked = cls.objects.filter(slot_start=cls.slot_for(pickup_time)).values_list('booked', flat=True).first()
+        return booked or 0
+
+    @classmethod
+    def reserve(cls, pickup_time):
+        """Atomically take one place in the slot. Returns False if the slot is full."""
+        slot_start = cls.slot_for(pickup_time)
+        with transaction.atomic():
+            cls.objects.get_or_create(slot_start=slot_start)
+            updated = cls.objects.filter(
+                slot_start=slot_start,
+                booked__lt=cls.SLOT_LIMIT
+            ).update(booked=F('booked') + 1)
+        return updated == 1
+
+    @classmethod
+    def release(cls, pickup_time):
+        cls.objects.filter(
+            slot_start=cls.slot_for(pickup_time),
+            booked__gt=0
+        ).update(booked=F('booked') - 1)
+
+    class Meta:
+        ordering = ['slot_start']
+
+class DepotCapacityQuerySet(models.QuerySet):
+    def with_booking_stats(self):
+        """Annotate booked, available and full for every row in a single query."""
+        return self.annotate(
+            booked=F('active_bookings'),
+            available=F('total_capacity') - F('active_bookings'),
+            full=ExpressionWrapper(Q(active_bookings__gte=F('total_capacity')), output_field=BooleanField()),
+        )
 
 class DepotCapacity(models.Model):
     depot = models.OneToOneField(CustomUser, on_delete=models.CASCADE, limit_choices_to={'user_type': 'DEPOT'}, related_name='depot_capacity')
     total_capacity = models.PositiveIntegerField(help_text='Total number of containers that can be stored')
     current_capacity = models.PositiveIntegerField(default=0, help_text='Current number of containers stored')
+    active_bookings = models.PositiveIntegerField(default=0, help_text='Number of pending and confirmed bookings')
     last_updated = models.DateTimeField(auto_now=True)
 
+    objects = DepotCapacityQuerySet.as_manager()
+
     def get_booked_count(self):
-        """Get the count of active bookings for this depot"""
-        return ContainerBooking.objects.filter(
-            depot=self.depot,
-            status__in=['PENDING', 'CONFIRMED']
-        ).count()
+        """Get the count of active bookings for this depot, kept up to date by DepotSlot"""
+        return self.active_bookings
 
     def available_capacity(self):
         """Calculate available capacity based on total capacity and current bookings"""
@@ -70,12 +353,117 @@ class DepotCapacity(models.Model):
         return self.available_capacity() <= 0
 
     def __str__(self):
-        booked = self.get_booked_count()
-        return f"{self.depot.company_name} Capacity: {booked}/{self.total_capacity} ({self.available_capacity()} available)"
+        booked = getattr(self, 'booked', None)
+        if booked is None:
+            booked = self.get_booked_count()
+        return f"{self.depot.company_name} Capacity: {booked}/{self.total_capacity} ({self.total_capacity - booked} available)"
 
     class Meta:
         verbose_name_plural = 'Depot Capacities'
 
+class DepotSlot(models.Model):
+    """
+    Reservation ledger for container bookings: one counter per depot and hour.
+    Together with DepotCapacity.active_bookings it replaces the COUNT queries
+    that used to guard the hourly and total capacity limits.
+    """
+    SLOT_LIMIT = 3
+
+    depot = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'user_type': 'DEPOT'}, related_name='depot_slots')
+    slot_start = models.DateTimeField()
+    booked = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.depot_id} {self.slot_start:%Y-%m-%d %H:00}: {self.booked}/{self.SLOT_LIMIT}"
+
+    @staticmethod
+    def slot_for(booking_time):
+        return booking_time.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def get_booked_count(cls, depot, booking_time):
+        booked = cls.objects.filter(
+            depot_id=getattr(depot, 'pk', depot),
+            slot_start=cls.slot_for(booking_time)
+        ).values_list('booked', flat=True).first()
+        return booked or 0
+
+    @classmethod
+    def remaining_by_slot(cls, depot_ids, start, end):
+        """
+        Remaining places per (depot_id, slot_start) in [start, end), read from
+        the ledger in one query. Slots without a ledger row are fully free.
+        """
+        booked = cls.objects.filter(
+            depot_id__in=depot_ids,
+            slot_start__gte=start,
+            slot_start__lt=end
+        ).values_list('depot_id', 'slot_start', 'booked')
+        return {(depot_id, slot_start): max(0, cls.SLOT_LIMIT - count) for depot_id, slot_start, count in booked}
+
+    @classmethod
+    def reserve(cls, depot, booking_time):
+        """
+        Take one place in the depot's hourly slot and in its total capacity.
+        Both counters are bumped with conditional UPDATEs in one transaction,
+        so concurrent bookings cannot exceed either limit.
+        """
+        depot_id = getattr(depot, 'pk', depot)
+        slot_start = cls.slot_for(booking_time)
+        with transaction.atomic():
+            try:
+                DepotCapacity.objects.select_for_update().get(depot_id=depot_id)
+            except DepotCapacity.DoesNotExist:
+                raise ValidationError({'depot': 'This depot has not configured its capacity.'})
+            if not DepotCapacity.objects.filter(
+                depot_id=depot_id,
+                active_bookings__lt=F('total_capacity')
+            ).update(active_bookings=F('active_bookings') + 1):
+                raise ValidationError({
+                    'depot': 'This depot is currently at full capacity. Please choose another depot or try later.'
+                })
+
+            cls.objects.get_or_create(depot_id=depot_id, slot_start=slot_start)
+            if not cls.objects.filter(
+                depot_id=depot_id,
+                slot_start=slot_start,
+                booked__lt=cls.SLOT_LIMIT
+            ).update(booked=F('booked') + 1):
+                raise ValidationError({
+                    'booking_time': 'This time slot is full (maximum 3 bookings per hour). Please select another time.'
+                })
+
+    @classmethod
+    def release(cls, depot, booking_time):
+        depot_id = getattr(depot, 'pk', depot)
+        with transaction.atomic():
+            DepotCapacity.objects.filter(
+                depot_id=depot_id,
+                active_bookings__gt=0
+            ).update(active_bookings=F('active_bookings') - 1)
+            cls.objects.filter(
+                depot_id=depot_id,
+                slot_start=cls.slot_for(booking_time),
+                booked__gt=0
+            ).update(booked=F('booked') - 1)
+
+    class Meta:
+        ordering = ['slot_start']
+        constraints = [
+            models.UniqueConstraint(fields=['depot', 'slot_start'], name='unique_depot_slot'),
+        ]
+
+class ContainerBookingQuerySet(models.QuerySet):
+    def active(self):
+        """
+        Pending and confirmed bookings. The statuses are written into the SQL
+        instead of bound as parameters: SQLite only uses a partial index when
+        it can match the index condition against literals, and
+        booking_depot_active_idx has the same condition.
+        """
+        statuses = ', '.join(f"'{status}'" for status in self.model.ACTIVE_STATUSES)
+        return self.filter(Func(F('status'), template=f'%(expressions)s IN ({statuses})', output_field=BooleanField()))
+
 class ContainerBooking(models.Model):
     STATUS_CHOICES = (
         ('PENDING', 'Pending'),
@@ -83,6 +471,7 @@ class ContainerBooking(models.Model):
         ('COMPLETED', 'Completed'),
         ('CANCELLED', 'Cancelled'),
     )
+    ACTIVE_STATUSES = ('PENDING', 'CONFIRMED')
 
     driver = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'user_type': 'DRIVER'}, related_name='container_bookings')
     depot = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'user_type': 'DEPOT'}, related_name='depot_bookings')
@@ -92,38 +481,74 @@ class ContainerBooking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ContainerBookingQuerySet.as_manager()
+
     def __str__(self):
         return f"Booking for {self.container_number} at {self.depot.company_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        # The reloaded values are what the next save changes
+        refreshed = {
+            field.attname for field in self._meta.concrete_fields
+            if fields is None or field.name in fields or field.attname in fields
+        }
+        self._loaded_values = {
+            **getattr(self, '_loaded_values', {}),
+            **{name: self.__dict__[name] for name in refreshed if name in self.__dict__},
+        }
+
+    def _reservation_key(self, depot_id, booking_time, status):
+        if status not in self.ACTIVE_STATUSES or booking_time is None:
+            return None
+        return (depot_id, DepotSlot.slot_for(booking_time))
+
     def save(self, *args, **kwargs):
         if not self.container_number:
             import uuid
             self.container_number = str(uuid.uuid4().hex[:8])
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Move the reservation when the booking enters or leaves an active
+            # status or changes depot or hour
+            previous = None
+            if not self._state.adding:
+                previous = ContainerBooking.objects.select_for_update().filter(pk=self.pk).values(
+                    'depot_id', 'booking_time', 'status'
+                ).first()
+            old_key = previous and self._reservation_key(previous['depot_id'], previous['booking_time'], previous['status'])
+            new_key = self._reservation_key(self.depot_id, self.booking_time, self.status)
+            if old_key != new_key:
+                if old_key:
+                    DepotSlot.release(previous['depot_id'], previous['booking_time'])
+                if new_key:
+                    DepotSlot.reserve(self.depot_id, self.booking_time)
+            super().save(*args, **kwargs)
+        self._loaded_values = {
+            'driver_id': self.driver_id, 'depot_id': self.depot_id, 'booking_time': self.booking_time, 'status': self.status,
+        }
 
     def delete(self, *args, **kwargs):
-        # If deleting a confirmed booking, decrease capacity
-        if self.status == 'CONFIRMED':
-            depot_capacity = self.depot.depot_capacity
-            depot_capacity.current_capacity = max(0, depot_capacity.current_capacity - 1)
-            depot_capacity.save()
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            # If deleting a confirmed booking, decrease capacity
+            if self.status == 'CONFIRMED':
+                depot_capacity = self.depot.depot_capacity
+                depot_capacity.current_capacity = max(0, depot_capacity.current_capacity - 1)
+                depot_capacity.save(update_fields=['current_capacity', 'last_updated'])
+            return super().delete(*args, **kwargs)
 
     @classmethod
     def get_bookings_in_timeslot(cls, depot, booking_time):
         # Get number of bookings in the same hour
-        start_time = booking_time.replace(minute=0, second=0, microsecond=0)
-        end_time = start_time + timedelta(hours=1)
-        return cls.objects.filter(
-            depot=depot,
-            booking_time__gte=start_time,
-            booking_time__lt=end_time,
-            status__in=['PENDING', 'CONFIRMED']
-        ).count()
+        return DepotSlot.get_booked_count(depot, booking_time)
 
     def clean(self):
-        from django.core.exceptions import ValidationError
-        # Check depot capacity
+        # Early feedback for forms; save() enforces the limits through DepotSlot
         depot_capacity = self.depot.depot_capacity
         if depot_capacity.is_full() and (self._state.adding or self.status == 'CONFIRMED'):
             raise ValidationError({
@@ -133,10 +558,196 @@ class ContainerBooking(models.Model):
         # Check time slot availability
         if self.booking_time:
             bookings_count = self.__class__.get_bookings_in_timeslot(self.depot, self.booking_time)
-            if bookings_count >= 3 and (self._state.adding or self._loaded_values.get('booking_time') != self.booking_time):
+            if bookings_count >= DepotSlot.SLOT_LIMIT and (self._state.adding or self._loaded_values.get('booking_time') != self.booking_time):
                 raise ValidationError({
                     'booking_time': 'This time slot is full (maximum 3 bookings per hour). Please select another time.'
                 })
 
     class Meta:
-        ordering = ['-booking_time']
\ No newline at end of file
+        ordering = ['-booking_time']
+        indexes = [
+            # Driver booking list, in its keyset order
+            models.Index(fields=['driver', '-booking_time', '-id'], name='booking_driver_time_idx'),
+            models.Index(fields=['depot', 'status', 'booking_time'], name='booking_depot_status_idx'),
+            # Active bookings shown on the depot capacity page, queried with
+            # ContainerBooking.objects.active() so SQLite can match the condition
+            models.Index(
+                fields=['depot', 'booking_time', 'id'],
+                name='booking_depot_active_idx',
+                condition=Q(status__in=['PENDING', 'CONFIRMED']),
+            ),
+            # Delta sync of the driver's bookings
+            models.Index(fields=['driver', 'updated_at', 'id'], name='booking_driver_updated_idx'),
+        ]
+
+
+class Tombstone(models.Model):
+    """
+    Marks a cargo or booking that was deleted or left a scope, so delta-sync
+    clients holding a copy can drop it. One row per scope it was visible in.
+    """
+    KIND_CHOICES = (
+        ('cargo', 'Cargo'),
+        ('booking', 'Container booking'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    scope = models.CharField(max_length=50)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} removed from {self.scope}"
+
+    @classmethod
+    def record(cls, kind, object_id, scopes):
+        cls.objects.bulk_create([cls(kind=kind, object_id=object_id, scope=scope) for scope in sorted(scopes)])
+
+    @classmethod
+    def prune(cls, before):
+        """Delete tombstones older than ``before``, returns how many."""
+        return cls.objects.filter(deleted_at__lt=before).delete()[0]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['scope', 'deleted_at', 'id'], name='tombstone_scope_idx'),
+        ]
+
+
+class ArchivedCargo(models.Model):
+    """
+    Picked up cargo moved out of Cargo by the archive job, with its original
+    id and timestamps. Read alongside Cargo by the driver history views.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    cargo_number = models.CharField(max_length=100, db_index=True)
+    cargo_owner = models.CharField(max_length=200)
+    storage = models.CharField(max_length=200)
+    arrival_date = models.DateField()
+    pickup_date = models.DateField()
+    scheduled_pickup_time = models.DateTimeField(null=True, blank=True)
+    arrived_at_storage = models.BooleanField(default=False)
+    is_picked_up = models.BooleanField(default=True)
+    cfs_received = models.BooleanField(default=False)
+    cfs_picked_up = models.BooleanField(default=False)
+    stage = models.CharField(max_length=20, choices=Cargo.STAGE_CHOICES, default='PICKED_UP')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    port = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_port_cargos')
+    cfs = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_cfs_cargos', null=True, blank=True)
+    driver = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, related_name='archived_driver_cargos', null=True, blank=True)
+    owner_company = models.ForeignKey(Company, on_delete=models.SET_NULL, related_name='archived_owned_cargos', null=True, blank=True)
+    storage_company = models.ForeignKey(Company, on_delete=models.SET_NULL, related_name='archived_stored_cargos', null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.cargo_number} - {self.cargo_owner} (archived)"
+
+    class Meta:
+        indexes = [
+            # Driver picked up history, same order as cargo_driver_picked_idx
+            models.Index(fields=['driver', '-scheduled_pickup_time', '-id'], name='archived_cargo_driver_idx'),
+            # Port manifest export
+            models.Index(fields=['port', 'id'], name='archived_cargo_port_idx'),
+        ]
+
+
+class ArchivedContainerBooking(models.Model):
+    """Completed or cancelled booking moved out of ContainerBooking by the archive job."""
+    id = models.BigIntegerField(primary_key=True)
+    driver = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_container_bookings')
+    depot = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_depot_bookings')
+    booking_time = models.DateTimeField()
+    container_number = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=ContainerBooking.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived booking for {self.container_number}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['driver', '-booking_time', '-id'], name='archived_booking_driver_idx'),
+        ]
+
+
+class Task(models.Model):
+    """
+    Background task in the database queue, see users.taskqueue. A claimed
+    task is RUNNING until ``available_at``, then another worker may take it
+    over. Finished tasks are deleted; failed ones stay for inspection.
+    """
+    STATUS_CHOICES = (
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('FAILED', 'Failed'),
+    )
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='QUEUED')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    available_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at', 'id'], name='task_claim_idx'),
+        ]
+
+
+class DepotHourStats(models.Model):
+    """
+    Bookings per depot, hour and status, kept up to date by users.stats.
+    Signed counters, so a missed write shows as drift rather than an error.
+    """
+    KEY_FIELDS = ('depot_id', 'hour')
+
+    depot = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='depot_hour_stats')
+    hour = models.DateTimeField()
+    pending = models.IntegerField(default=0)
+    confirmed = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.depot_id} {self.hour:%Y-%m-%d %H:00}"
+
+    class Meta:
+        verbose_name_plural = 'Depot hour stats'
+        constraints = [
+            models.UniqueConstraint(fields=['depot', 'hour'], name='unique_depot_hour_stats'),
+        ]
+
+
+class PortDayStats(models.Model):
+    """
+    Cargo arrivals and pickups per port and day, kept up to date by
+    users.stats. dwell_days sums the days from arrival to pickup of the day's
+    pickups.
+    """
+    KEY_FIELDS = ('port_id', 'day')
+
+    port = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='port_day_stats')
+    day = models.DateField()
+    arrivals = models.IntegerField(default=0)
+    pickups = models.IntegerField(default=0)
+    dwell_days = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.port_id} {self.day}"
+
+    class Meta:
+        verbose_name_plural = 'Port day stats'
+        constraints = [
+            models.UniqueConstraint(fields=['port', 'day'], name='unique_port_day_stats'),
+        ]
@@ -0,0 +1,260 @@
+import base64
+import binascii
+import datetime
+import json
+from functools import cmp_to_key
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder truncates microseconds, which would make the cursor
+    # skip rows created within the same millisecond.
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps({'d': direction, 'v': values}, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        direction, values = payload['d'], payload['v']
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset plus the cursors around it."""
+
+    def __init__(self, object_list, request, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.request = request
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def _url_for(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        return f'{self.request.path}?{params.urlencode()}'
+
+    @property
+    def next_url(self):
+        return self._url_for(self.next_cursor)
+
+    @property
+    def previous_url(self):
+        return self._url_for(self.previous_cursor)
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a fixed, unique ordering such as
+    ('-created_at', '-id'). Every page is a single indexed range scan with
+    LIMIT, so the cost does not grow with how far the user has paged.
+    """
+
+    def __init__(self, queryset, ordering, per_page=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset
+        self.model = queryset.model
+        self.keys = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.per_page = per_page
+
+    def _field(self, name):
+        return self.model._meta.get_field(name)
+
+    def _order_by(self, reverse):
+        # Plain ASC/DESC so that composite indexes can serve the ORDER BY
+        return [F(name).asc() if descending == reverse else F(name).desc() for name, descending in self.keys]
+
+    def _after(self, values, reverse):
+        """Q matching rows strictly after ``values`` in the traversal order."""
+        nulls_largest = connections[self.queryset.db].features.nulls_order_largest
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(self.keys, values):
+            descending = descending != reverse
+            nullable = self._field(name).null
+            # Where the backend sorts NULLs for this direction
+            nulls_last = nullable and descending != nulls_largest
+            if value is None:
+                if nullable and not nulls_last:
+                    condition |= equal & Q(**{f'{name}__isnull': False})
+                equal &= Q(**{f'{name}__isnull': True})
+                continue
+            step = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+            if nulls_last:
+                step |= Q(**{f'{name}__isnull': True})
+            condition |= equal & step
+            equal &= Q(**{name: value})
+        return condition
+
+    def _values(self, obj):
+        return [getattr(obj, name) for name, _ in self.keys]
+
+    def _parse(self, values):
+        if len(values) != len(self.keys):
+            raise InvalidCursor(values)
+        try:
+            return [None if value is None else self._field(name).to_python(value)
+                    for (name, _), value in zip(self.keys, values)]
+        except Exception:
+            raise InvalidCursor(values)
+
+    def _query(self, cursor, queryset=None):
+        direction, values = ('next', None)
+        if cursor:
+            direction, values = decode_cursor(cursor)
+            values = self._parse(values)
+        reverse = direction == 'prev'
+
+        queryset = (self.queryset if queryset is None else queryset).order_by(*self._order_by(reverse))
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse))
+        return queryset[:self.per_page + 1], values, reverse
+
+    def page(self, request, cursor=None):
+        queryset, values, reverse = self._query(cursor)
+        return self._page(request, list(queryset), values, reverse)
+
+    async def apage(self, request, cursor=None):
+        queryset, values, reverse = self._query(cursor)
+        return self._page(request, [obj async for obj in queryset], values, reverse)
+
+    def _page(self, request, rows, values, reverse):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            more_after = True if reverse else has_more
+            more_before = has_more if reverse else values is not None
+            if more_after:
+                next_cursor = encode_cursor('next', self._values(rows[-1]))
+            if more_before:
+                previous_cursor = encode_cursor('prev', self._values(rows[0]))
+        elif reverse:
+            next_cursor = encode_cursor('next', values)
+        return KeysetPage(rows, request, next_cursor, previous_cursor)
+
+
+class MergedKeysetPaginator(KeysetPaginator):
+    """
+    Keyset pagination over several querysets with the same ordering fields,
+    such as a table and its archive. Each page reads one page from every
+    queryset and merges them, so the cost still does not grow with depth.
+    """
+
+    def __init__(self, querysets, ordering, per_page=DEFAULT_PAGE_SIZE):
+        super().__init__(querysets[0], ordering, per_page)
+        self.querysets = querysets
+
+    def _compare(self, reverse):
+        nulls_largest = connections[self.queryset.db].features.nulls_order_largest
+
+        def compare(a, b):
+            for name, descending in self.keys:
+                # Sort NULLs where the database puts them
+                x, y = getattr(a, name), getattr(b, name)
+                x, y = ((x is None) == nulls_largest, x), ((y is None) == nulls_largest, y)
+                if x != y:
+                    result = -1 if x < y else 1
+                    return -result if descending != reverse else result
+            return 0
+        return cmp_to_key(compare)
+
+    def _merge(self, rows, reverse):
+        return sorted(rows, key=self._compare(reverse))[:self.per_page + 1]
+
+    def page(self, request, cursor=None):
+        rows = []
+        for queryset in self.querysets:
+            query, values, reverse = self._query(cursor, queryset)
+            rows += list(query)
+        return self._page(request, self._merge(rows, reverse), values, reverse)
+
+    async def apage(self, request, cursor=None):
+        rows = []
+        for queryset in self.querysets:
+            query, values, reverse = self._query(cursor, queryset)
+            rows += [obj async for obj in query]
+        return self._page(request, self._merge(rows, reverse), values, reverse)
+
+
+def _paginator(request, queryset, ordering, per_page):
+    try:
+        per_page = max(1, min(int(request.GET.get('per_page', per_page)), MAX_PAGE_SIZE))
+    except ValueError:
+        pass
+    if isinstance(queryset, (list, tuple)):
+        return MergedKeysetPaginator(queryset, ordering, per_page)
+    return KeysetPaginator(queryset, ordering, per_page)
+
+
+def paginate_keyset(request, queryset, ordering, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Build a KeysetPage from the ``cursor`` and ``per_page`` query parameters.
+    A malformed cursor falls back to the first page. A list of querysets is
+    paginated as one merged sequence.
+    """
+    paginator = _paginator(request, queryset, ordering, per_page)
+    try:
+        return paginator.page(request, request.GET.get('cursor'))
+    except InvalidCursor:
+        return paginator.page(request)
+
+
+async def apaginate_keyset(request, queryset, ordering, per_page=DEFAULT_PAGE_SIZE):
+    """paginate_keyset() for async views, the page is read with the async ORM."""
+    paginator = _paginator(request, queryset, ordering, per_page)
+    try:
+        return await paginator.apage(request, request.GET.get('cursor'))
+    except InvalidCursor:
+        return await paginator.apage(request)
+
+
+def page_as_json(page, fields):
+    return {
+        'results': [{field: getattr(obj, field) for field in fields} for obj in page],
+        'next': page.next_url,
+        'previous': page.previous_url,
+    }
@@ -0,0 +1,304 @@
+"""
+Sampled per-view profiling.
+
+ProfilingMiddleware records, for a sample of requests, the SQL query count,
+DB time, template render time and wall time under the resolved URL name. Each
+metric goes into a log-scale histogram in the cache, one set of counters per
+time window, so recording costs a handful of cache increments and no queries.
+Percentiles are read back over the last PROFILING_WINDOWS windows.
+
+Queries with the same shape repeated PROFILING_N_PLUS_ONE_THRESHOLD times in
+one request are flagged as likely N+1 patterns.
+"""
+import logging
+import math
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('queries', 'db_ms', 'template_ms', 'wall_ms')
+PERCENTILES = (50, 95, 99)
+
+# Bucket k holds values in (GROWTH ** (k - 1), GROWTH ** k], bucket 0 holds
+# everything up to 1. Percentiles are reported as bucket upper bounds, so
+# they are within 25% of the true value.
+GROWTH = 1.25
+MAX_BUCKET = 60
+
+_current = ContextVar('users_profile', default=None)
+
+
+def sample_rate():
+    return getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+
+
+def window_seconds():
+    return getattr(settings, 'PROFILING_WINDOW', 300)
+
+
+def window_count():
+    return getattr(settings, 'PROFILING_WINDOWS', 12)
+
+
+def n_plus_one_threshold():
+    return getattr(settings, 'PROFILING_N_PLUS_ONE_THRESHOLD', 5)
+
+
+def bucket_for(value):
+    if value <= 1:
+        return 0
+    return min(math.ceil(math.log(value, GROWTH)), MAX_BUCKET)
+
+
+def bucket_bound(bucket):
+    return GROWTH ** bucket
+
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_SPACE = re.compile(r'\s+')
+
+
+def query_shape(sql):
+    """SQL with parameter lists and literals collapsed, for spotting repeats."""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated_shapes(self):
+        threshold = n_plus_one_threshold()
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+
+def _profiled_execute(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def _wrap_connection(connection, **kwargs):
+    if _profiled_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_profiled_execute)
+
+
+def instrument_queries():
+    """
+    Give every new connection a permanent wrapper that counts into the
+    request's profile. Async views query from sync_to_async threads with
+    their own connections, which a wrapper added per request would miss.
+    """
+    connection_created.connect(_wrap_connection, dispatch_uid='users.profiling')
+
+
+def _profiled_render(render):
+    def wrapper(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return render(self, context, request)
+        # Only time the outermost render, includes and nested render_to_string
+        # calls are part of it
+        profile.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_time += time.perf_counter() - start
+    wrapper.profiled = True
+    return wrapper
+
+
+def instrument_templates():
+    if not getattr(DjangoTemplate.render, 'profiled', False):
+        DjangoTemplate.render = _profiled_render(DjangoTemplate.render)
+
+
+def _key(window, name, suffix):
+    return f'perf:{window}:{name}:{suffix}'
+
+
+URLS_KEY = 'perf:urls'
+N_PLUS_ONE_KEY = 'perf:nplus1:{}'
+
+_registered = set()
+
+
+def _incr(key, timeout):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout):
+            cache.incr(key)
+
+
+def _register(window, name):
+    # Re-register once per window and process, which repairs a name lost to
+    # a concurrent write in an earlier window
+    if (window, name) in _registered:
+        return
+    names = cache.get(URLS_KEY) or set()
+    if name not in names:
+        cache.set(URLS_KEY, names | {name}, timeout=None)
+    _registered.add((window, name))
+
+
+def record(name, values, repeated_shapes=None):
+    """Add one request's ``values`` (keyed by METRICS) to the histograms."""
+    window = int(time.time() // window_seconds())
+    timeout = window_seconds() * (window_count() + 1)
+    _register(window, name)
+    for metric in METRICS:
+        _incr(_key(window, name, f'{metric}:{bucket_for(values[metric])}'), timeout)
+    if repeated_shapes:
+        _incr(_key(window, name, 'nplus1'), timeout)
+        examples = cache.get(N_PLUS_ONE_KEY.format(name)) or {}
+        for shape, count in repeated_shapes.items():
+            examples[shape] = max(count, examples.get(shape, 0))
+        cache.set(N_PLUS_ONE_KEY.format(name), examples, timeout)
+
+
+def _percentile(histogram, total, percentile, integer=False):
+    threshold = total * percentile / 100
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= threshold:
+            # Counts are whole numbers, so the largest one in the bucket
+            return math.floor(bucket_bound(bucket)) if integer else round(bucket_bound(bucket), 1)
+    return None
+
+
+def report(names=None):
+    """
+    Percentiles per URL name over the retained windows, busiest first. Each
+    entry has the sample count, p50/p95/p99 per metric, the number of sampled
+    requests flagged as N+1 and the worst repeated query shapes seen.
+    """
+    names = sorted(names or cache.get(URLS_KEY) or ())
+    current = int(time.time() // window_seconds())
+    windows = range(current - window_count() + 1, current + 1)
+    keys = [
+        _key(window, name, f'{metric}:{bucket}')
+        for name in names for window in windows for metric in METRICS for bucket in range(MAX_BUCKET + 1)
+    ] + [_key(window, name, 'nplus1') for name in names for window in windows]
+    counts = cache.get_many(keys)
+
+    entries = []
+    for name in names:
+        histograms = {metric: Counter() for metric in METRICS}
+        n_plus_one = 0
+        for window in windows:
+            for metric in METRICS:
+                for bucket in range(MAX_BUCKET + 1):
+                    histograms[metric][bucket] += counts.get(_key(window, name, f'{metric}:{bucket}'), 0)
+            n_plus_one += counts.get(_key(window, name, 'nplus1'), 0)
+        samples = sum(histograms['wall_ms'].values())
+        if not samples:
+            continue
+        entry = {'name': name, 'samples': samples, 'n_plus_one': n_plus_one}
+        for metric in METRICS:
+            entry[metric] = {
+                f'p{percentile}': _percentile(histograms[metric], samples, percentile, integer=metric == 'queries')
+                for percentile in PERCENTILES
+            }
+        examples = cache.get(N_PLUS_ONE_KEY.format(name)) or {}
+        entry['repeated_queries'] = sorted(
+            ({'sql': shape, 'count': count} for shape, count in examples.items()), key=lambda e: -e['count']
+        )[:5]
+        entries.append(entry)
+    entries.sort(key=lambda e: -e['samples'])
+    return entries
+
+
+@contextmanager
+def profiling(profile):
+    """Count the queries and template time of the enclosed code into ``profile``."""
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+class ProfilingMiddleware:
+    """
+    Profile a PROFILING_SAMPLE_RATE fraction of requests. With the default
+    rate of 0 the middleware removes itself at startup.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if sample_rate() <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        instrument_queries()
+        instrument_templates()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= sample_rate():
+            return self.get_response(request)
+        profile, start = RequestProfile(), time.perf_counter()
+        with profiling(profile):
+            response = self.get_response(request)
+        self.record(request, profile, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= sample_rate():
+            return await self.get_response(request)
+        profile, start = RequestProfile(), time.perf_counter()
+        with profiling(profile):
+            response = await self.get_response(request)
+        # Off the event loop, the cache backend may be blocking
+        await sync_to_async(self.record)(request, profile, time.perf_counter() - start)
+        return response
+
+    def record(self, request, profile, wall_time):
+        match = getattr(request, 'resolver_match', None)
+        name = match.view_name if match else 'unresolved'
+        repeated = profile.repeated_shapes()
+        if repeated:
+            logger.warning('Possible N+1 queries in %s: %s', name, repeated)
+        record(name, {
+            'queries': profile.queries,
+            'db_ms': profile.db_time * 1000,
+            'template_ms': profile.template_time * 1000,
+            'wall_ms': wall_time * 1000,
+        }, repeated)
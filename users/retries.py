@@ -0,0 +1,47 @@
+"""
+Retry write views that lose the race for SQLite's write lock.
+
+SQLite allows one writer at a time. With BEGIN IMMEDIATE and busy_timeout a
+blocked writer waits for the lock, so "database is locked" only surfaces
+when it stays blocked for the whole timeout. retry_on_lock() runs the view
+again in that case, with jittered exponential backoff, so a burst of
+bookings slows down instead of failing.
+"""
+import logging
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+logger = logging.getLogger(__name__)
+
+LOCK_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def is_lock_error(exc):
+    return isinstance(exc, OperationalError) and any(message in str(exc) for message in LOCK_MESSAGES)
+
+
+def retry_on_lock(view):
+    """
+    Run ``view`` again when it fails on a locked database, up to
+    DB_LOCK_RETRIES times. The view's writes must be in its own transactions:
+    inside an outer atomic block the error is raised, since that transaction
+    cannot be repeated from here.
+    """
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        retries = getattr(settings, 'DB_LOCK_RETRIES', 3)
+        delay = getattr(settings, 'DB_LOCK_RETRY_DELAY', 0.05)
+        for attempt in range(retries + 1):
+            try:
+                return view(request, *args, **kwargs)
+            except OperationalError as e:
+                if attempt == retries or not is_lock_error(e) or connection.in_atomic_block:
+                    raise
+                logger.warning('Database locked in %s, retry %d of %d', request.path, attempt + 1, retries)
+                # Full jitter keeps the retrying writers from colliding again
+                time.sleep(random.uniform(0, delay * 2 ** attempt))
+    return inner
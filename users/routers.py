@@ -0,0 +1,148 @@
+"""
+Primary/replica database routing.
+
+ReplicaRouter sends writes to the default database and reads made while
+serving a request to one of DATABASE_REPLICAS. Reads go to the primary
+instead when the request is not a GET, HEAD or OPTIONS request, once the
+request has written, inside a transaction, and for REPLICA_PIN_SECONDS after
+the client's last write, so a driver sees their booking straight away even
+when the replicas lag. Outside requests, e.g. in management commands, every
+read goes to the primary.
+
+ReplicaPinningMiddleware tracks the request and sets the pin cookie. With no
+replicas configured it removes itself and the router sends everything to
+the primary.
+"""
+import random
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = ContextVar('users_db_routing', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+class RoutingState:
+    """Routing decisions for one request. Mutated in place, so threads running its queries share it."""
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (state is None or state.pinned or state.wrote or not replicas()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema from the primary with the data
+        return False if db in replicas() else None
+
+
+@contextmanager
+def primary_reads():
+    """Send the current request's reads to the primary inside the block."""
+    state = _state.get()
+    if state is None or state.pinned:
+        yield
+        return
+    state.pinned = True
+    try:
+        yield
+    finally:
+        state.pinned = False
+
+
+class ReplicaPinningMiddleware:
+    """Route the request's reads and pin the client to the primary after it writes."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState(self.pinned(request))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(response, state)
+
+    async def __acall__(self, request):
+        state = RoutingState(self.pinned(request))
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(response, state)
+
+    def pinned(self, request):
+        return request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+
+    def pin(self, response, state):
+        if state.wrote:
+            response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds(), httponly=True, samesite='Lax')
+        return response
+
+
+def copy_to_replicas():
+    """
+    Copy the primary into every replica with SQLite's backup API, the local
+    stand-in for replication. Returns the replica aliases copied.
+    """
+    primary = connections[DEFAULT_DB_ALIAS]
+    if primary.vendor != 'sqlite':
+        raise ImproperlyConfigured('Copying replicas is only supported for SQLite databases.')
+    primary.ensure_connection()
+    for alias in replicas():
+        replica = connections[alias]
+        if replica.vendor != 'sqlite':
+            raise ImproperlyConfigured(f'Replica {alias} is not an SQLite database.')
+        replica.close()
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+    return list(replicas())
@@ -0,0 +1,285 @@
+"""
+Synthetic logistics data for load testing.
+
+seed_world() builds a reproducible world of port, CFS, depot and driver
+users, cargo spread over a date range and container booking histories. All
+rows are written with bulk_create in batches, so millions of cargo rows fit
+in flat memory. The PickupSlot and DepotSlot ledgers and the depot booking
+counters are filled in to match, so the seeded data respects the same limits
+as the views, and the rollup statistics are rebuilt.
+"""
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Cargo, Company, ContainerBooking, CustomUser, DepotCapacity, DepotSlot, PickupSlot
+from .stats import rebuild_stats
+
+DEFAULT_PASSWORD = 'seed-password'
+USER_TYPES = ('PORT', 'CFS', 'DEPOT', 'DRIVER')
+
+# Share of cargo arriving on each weekday, Monday first
+WEEKDAY_WEIGHTS = (1.2, 1.1, 1.1, 1.0, 1.0, 0.4, 0.2)
+
+
+def seed_email(prefix, user_type, number):
+    return f'{prefix.lower()}-{user_type.lower()}{number}@example.com'
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """Let bulk_create keep the created_at/updated_at values set on the rows."""
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class World:
+    """Users of a seeded world, by type, plus the company names in use."""
+
+    def __init__(self, prefix, users, owners):
+        self.prefix = prefix
+        self.users = users
+        self.owners = owners
+
+    def ids(self, user_type):
+        return [user.pk for user in self.users[user_type]]
+
+
+def seed_users(prefix, counts, owners, password=DEFAULT_PASSWORD):
+    """
+    Create the seeded users that do not exist yet and return the World. Every
+    user shares one password hash, hashing it per user would dominate the run.
+    Drivers work for the cargo owners and CFS users run the storages.
+    """
+    password_hash = make_password(password)
+    storages = [f'{prefix} Storage {n}' for n in range(counts['CFS'])]
+    company_names = {
+        'PORT': lambda n: f'{prefix} Port {n}',
+        'CFS': lambda n: storages[n],
+        'DEPOT': lambda n: f'{prefix} Depot {n}',
+        'DRIVER': lambda n: owners[n % len(owners)],
+    }
+    wanted = {
+        seed_email(prefix, user_type, n): (user_type, company_names[user_type](n))
+        for user_type in USER_TYPES for n in range(counts[user_type])
+    }
+    existing = set(CustomUser.objects.filter(email__in=wanted).values_list('email', flat=True))
+    companies = Company.resolve_many(name for _, name in wanted.values())
+    CustomUser.objects.bulk_create([
+        CustomUser(
+            email=email,
+            username=email.split('@')[0],
+            user_type=user_type,
+            company_name=name,
+            company=companies.get(Company.normalize(name)),
+            password=password_hash,
+        )
+        for email, (user_type, name) in wanted.items() if email not in existing
+    ], batch_size=1000)
+
+    users = {user_type: [] for user_type in USER_TYPES}
+    for user in CustomUser.objects.filter(email__in=wanted).order_by('id'):
+        users[user.user_type].append(user)
+    return World(prefix, users, owners)
+
+
+class SlotLedger:
+    """Hourly slot counters filled up to a limit, seeded from the database."""
+
+    def __init__(self, limit, booked):
+        self.limit = limit
+        self.booked = booked
+
+    def take(self, key, start, rng, search_hours=72):
+        # Try the requested hour first, then nearby hours
+        for offset in range(search_hours):
+            slot = start + timedelta(hours=offset)
+            if self.booked.get(key(slot), 0) < self.limit:
+                self.booked[key(slot)] = self.booked.get(key(slot), 0) + 1
+                return slot + timedelta(minutes=rng.randrange(0, 60, 15))
+        return None
+
+
+def _arrival_dates(rng, start, days):
+    dates = [start + timedelta(days=n) for n in range(days)]
+    weights = [WEEKDAY_WEIGHTS[d.weekday()] for d in dates]
+    while True:
+        yield from rng.choices(dates, weights, k=1000)
+
+
+def _working_hour(rng, day):
+    return timezone.make_aware(datetime.combine(day, time(rng.randint(7, 18))))
+
+
+def generate_cargo(world, rng, count, days, pickup_ledger):
+    """
+    Yield unsaved Cargo rows. Arrival dates follow WEEKDAY_WEIGHTS over the
+    last ``days`` days and the lifecycle progress depends on the age: old
+    cargo is mostly picked up, cargo from the last few days mostly not.
+    """
+    today = timezone.localdate()
+    ports, cfs_users, drivers = world.users['PORT'], world.users['CFS'], world.users['DRIVER']
+    drivers_by_company = {}
+    for driver in drivers:
+        drivers_by_company.setdefault(driver.company_id, []).append(driver)
+    owner_companies = Company.resolve_many(world.owners)
+    arrivals = _arrival_dates(rng, today - timedelta(days=days), days + 14)
+
+    for number in range(count):
+        arrival = next(arrivals)
+        pickup = arrival + timedelta(days=rng.randint(1, 14))
+        owner = rng.choice(world.owners)
+        owner_company = owner_companies[Company.normalize(owner)]
+        cfs = rng.choice(cfs_users)
+        age = (today - arrival).days
+        progress = rng.random() + age / 30
+        cargo = Cargo(
+            cargo_number=f'{world.prefix}-{number:09d}',
+            cargo_owner=owner,
+            storage=cfs.company_name,
+            owner_company=owner_company,
+            storage_company_id=cfs.company_id,
+            arrival_date=arrival,
+            pickup_date=pickup,
+            port=rng.choice(ports),
+            arrived_at_storage=progress > 0.3,
+            cfs_received=progress > 0.5,
+        )
+        if cargo.cfs_received:
+            cargo.cfs = cfs
+        company_drivers = drivers_by_company.get(owner_company.pk)
+        if progress > 0.7 and company_drivers:
+            cargo.scheduled_pickup_time = pickup_ledger.take(lambda slot: slot, _working_hour(rng, pickup), rng)
+            if cargo.scheduled_pickup_time:
+                cargo.driver = rng.choice(company_drivers)
+                cargo.cfs_picked_up = progress > 0.9 and pickup <= today
+                cargo.is_picked_up = progress > 1 and pickup < today
+        cargo.stage = Cargo.compute_stage(cargo.current_values())
+        cargo.created_at = timezone.make_aware(datetime.combine(arrival, time(rng.randint(0, 23), rng.randint(0, 59))))
+        cargo.updated_at = cargo.created_at
+        yield cargo
+
+
+def generate_bookings(world, rng, count, days, depot_ledger, total_capacity, active):
+    """
+    Yield unsaved ContainerBooking rows spread over the last ``days`` days and
+    the next week. Past bookings are completed or cancelled, future ones
+    pending or confirmed and held in the depot ledgers. ``active`` maps depot
+    ids to their active booking count and is updated in place.
+    """
+    now = timezone.now()
+    today = timezone.localdate()
+    for number in range(count):
+        depot = rng.choice(world.users['DEPOT'])
+        day = today + timedelta(days=rng.randint(-days, 7))
+        booking_time = _working_hour(rng, day) + timedelta(minutes=rng.randrange(0, 60, 15))
+        if booking_time < now:
+            status = rng.choices(('COMPLETED', 'CANCELLED'), (9, 1))[0]
+        elif active[depot.pk] < total_capacity:
+            status = rng.choice(ContainerBooking.ACTIVE_STATUSES)
+            booking_time = depot_ledger.take(lambda slot: (depot.pk, slot), DepotSlot.slot_for(booking_time), rng)
+            if booking_time is None:
+                continue
+            active[depot.pk] += 1
+        else:
+            continue
+        created_at = booking_time - timedelta(days=rng.randint(0, 10), minutes=rng.randint(0, 600))
+        yield ContainerBooking(
+            driver=rng.choice(world.users['DRIVER']),
+            depot=depot,
+            booking_time=booking_time,
+            container_number=f'{world.prefix}-B{number:09d}',
+            status=status,
+            created_at=min(created_at, now),
+            updated_at=min(created_at, now),
+        )
+
+
+def seed_world(prefix='SEED', ports=5, cfs=10, depots=10, drivers=50, owners=20, cargo=100000, bookings=20000,
+               days=365, depot_capacity=500, seed=0, batch_size=5000, password=DEFAULT_PASSWORD, log=None):
+    """
+    Create the world described by the arguments and return row counts. The
+    same arguments and seed produce the same data. Cargo numbers carry the
+    prefix, so seed a second world into the same database with another one.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    if Cargo.objects.filter(cargo_number__startswith=f'{prefix}-').exists():
+        raise ValueError(f'Cargo with prefix {prefix} already exists, choose another prefix.')
+
+    owner_names = [f'{prefix} Owner {n}' for n in range(owners)]
+    world = seed_users(prefix, {'PORT': ports, 'CFS': cfs, 'DEPOT': depots, 'DRIVER': drivers}, owner_names, password)
+    log(f'Users: {sum(len(users) for users in world.users.values())}')
+    if not world.users['PORT'] or not world.users['CFS']:
+        raise ValueError('Seeding cargo needs at least one port and one CFS user.')
+
+    pickup_ledger = SlotLedger(PickupSlot.SLOT_LIMIT, dict(PickupSlot.objects.values_list('slot_start', 'booked')))
+    created = 0
+    with historical_timestamps(Cargo, ContainerBooking):
+        for batch in batched(generate_cargo(world, rng, cargo, days, pickup_ledger), batch_size):
+            with transaction.atomic():
+                Cargo.objects.bulk_create(batch)
+            created += len(batch)
+            log(f'Cargo: {created}/{cargo}')
+
+        depot_ids = world.ids('DEPOT')
+        depot_ledger = SlotLedger(DepotSlot.SLOT_LIMIT, {
+            (depot_id, slot_start): booked
+            for depot_id, slot_start, booked in DepotSlot.objects.filter(depot_id__in=depot_ids).values_list(
+                'depot_id', 'slot_start', 'booked'
+            )
+        })
+        active = dict.fromkeys(depot_ids, 0)
+        active.update(DepotCapacity.objects.filter(depot_id__in=depot_ids).values_list('depot_id', 'active_bookings'))
+        booked = 0
+        if depot_ids and world.users['DRIVER']:
+            bookings_iter = generate_bookings(world, rng, bookings, days, depot_ledger, depot_capacity, active)
+            for batch in batched(bookings_iter, batch_size):
+                with transaction.atomic():
+                    ContainerBooking.objects.bulk_create(batch)
+                booked += len(batch)
+                log(f'Bookings: {booked}/{bookings}')
+
+    # Write the ledgers back so the seeded slots count against new bookings
+    with transaction.atomic():
+        PickupSlot.objects.bulk_create(
+            [PickupSlot(slot_start=slot, booked=count) for slot, count in pickup_ledger.booked.items()],
+            update_conflicts=True, unique_fields=['slot_start'], update_fields=['booked'], batch_size=1000,
+        )
+        DepotSlot.objects.bulk_create(
+            [DepotSlot(depot_id=depot_id, slot_start=slot, booked=count)
+             for (depot_id, slot), count in depot_ledger.booked.items()],
+            update_conflicts=True, unique_fields=['depot', 'slot_start'], update_fields=['booked'], batch_size=1000,
+        )
+        for depot_id in depot_ids:
+            DepotCapacity.objects.get_or_create(depot_id=depot_id, defaults={'total_capacity': depot_capacity})
+        active = ContainerBooking.objects.filter(
+            depot_id__in=depot_ids, status__in=ContainerBooking.ACTIVE_STATUSES
+        ).values('depot_id').annotate(count=Count('id')).values_list('depot_id', 'count')
+        for depot_id, count in active:
+            DepotCapacity.objects.filter(depot_id=depot_id).update(active_bookings=count)
+    # bulk_create sends no signals, recount the rollups in one pass instead
+    rebuild_stats()
+    return {'users': sum(len(users) for users in world.users.values()), 'cargo': created, 'bookings': booked}
@@ -0,0 +1,170 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import bump_scope_versions
+from .events import booking_event, cargo_event, publish
+from .models import Cargo, ContainerBooking, DepotCapacity, DepotSlot, PickupSlot, Tombstone
+from .stats import (
+    BOOKING_STATS_FIELDS, CARGO_STATS_FIELDS, booking_counts, cargo_counts, record_change, stats_values,
+)
+from .taskqueue import enqueue
+from .tasks import notify_booking_status
+
+
+CARGO_SCOPE_FIELDS = (('port_id', 'port'), ('storage_company_id', 'storage'), ('owner_company_id', 'owner'), ('driver_id', 'driver'))
+
+
+def cargo_scopes_for_values(values):
+    """Cache scopes for a mapping of CARGO_SCOPE_FIELDS, e.g. a values() row."""
+    return {f'{prefix}:{values[field]}' for field, prefix in CARGO_SCOPE_FIELDS if values.get(field) is not None}
+
+
+def cargo_scopes(cargo):
+    """Cache scopes that can show this cargo, before and after the change."""
+    current = {field: getattr(cargo, field) for field, _ in CARGO_SCOPE_FIELDS}
+    return cargo_scopes_for_values(current) | cargo_scopes_for_values(getattr(cargo, '_loaded_values', {}))
+
+
+BOOKING_SCOPE_FIELDS = (('driver_id', 'driver'), ('depot_id', 'depot'))
+
+
+def booking_scopes_for_values(values):
+    return {f'{prefix}:{values[field]}' for field, prefix in BOOKING_SCOPE_FIELDS if values.get(field) is not None}
+
+
+def booking_scopes(booking):
+    current = {field: getattr(booking, field) for field, _ in BOOKING_SCOPE_FIELDS}
+    return booking_scopes_for_values(current) | booking_scopes_for_values(getattr(booking, '_loaded_values', {}))
+
+
+@receiver(post_save, sender=Cargo)
+@receiver(post_delete, sender=Cargo)
+def invalidate_cargo_scopes(sender, instance, **kwargs):
+    # Bump after commit so a concurrent render cannot cache uncommitted data
+    transaction.on_commit(partial(bump_scope_versions, *cargo_scopes(instance)))
+
+
+@receiver(post_save, sender=ContainerBooking)
+@receiver(post_delete, sender=ContainerBooking)
+def invalidate_booking_scopes(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_scope_versions, *booking_scopes(instance)))
+
+
+@receiver(post_save, sender=DepotCapacity)
+def invalidate_depot_capacity(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_scope_versions, f'depot:{instance.depot_id}'))
+
+
+@receiver(post_delete, sender=Cargo)
+def release_pickup_slot(sender, instance, **kwargs):
+    # A receiver rather than Cargo.delete(), so cascades and queryset deletes
+    # give the pickup slot back to the ledger too
+    if instance.scheduled_pickup_time:
+        PickupSlot.release(instance.scheduled_pickup_time)
+
+
+@receiver(post_delete, sender=ContainerBooking)
+def release_depot_slot(sender, instance, **kwargs):
+    # Frees the hourly slot and the depot's active_bookings for every kind of delete
+    if instance.status in ContainerBooking.ACTIVE_STATUSES:
+        DepotSlot.release(instance.depot_id, instance.booking_time)
+
+
+@receiver(post_save, sender=Cargo)
+def publish_cargo_saved(sender, instance, created, **kwargs):
+    event = cargo_event('cargo.created' if created else 'cargo.updated', instance)
+    transaction.on_commit(partial(publish, cargo_scopes(instance), event))
+
+
+@receiver(post_delete, sender=Cargo)
+def publish_cargo_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(publish, cargo_scopes(instance), cargo_event('cargo.deleted', instance)))
+
+
+def _publish_booking(scopes, event, depot_id):
+    # Read the counter after commit so the board shows the committed count
+    event['active_bookings'] = DepotCapacity.objects.filter(depot_id=depot_id).values_list(
+        'active_bookings', flat=True
+    ).first()
+    publish(scopes, event)
+
+
+@receiver(post_save, sender=ContainerBooking)
+def publish_booking_saved(sender, instance, created, **kwargs):
+    previous_status = getattr(instance, '_loaded_values', {}).get('status')
+    if created:
+        event_type = 'booking.created'
+    elif previous_status != instance.status:
+        event_type = f'booking.{instance.status.lower()}'
+    else:
+        event_type = 'booking.updated'
+    event = booking_event(event_type, instance)
+    transaction.on_commit(partial(_publish_booking, booking_scopes(instance), event, instance.depot_id))
+
+
+@receiver(post_delete, sender=ContainerBooking)
+def publish_booking_deleted(sender, instance, **kwargs):
+    event = booking_event('booking.deleted', instance)
+    transaction.on_commit(partial(_publish_booking, booking_scopes(instance), event, instance.depot_id))
+
+
+@receiver(post_delete, sender=Cargo)
+def tombstone_cargo_deleted(sender, instance, **kwargs):
+    # Written in the deleting transaction, so sync clients see both or neither
+    Tombstone.record('cargo', instance.pk, cargo_scopes(instance))
+
+
+@receiver(post_save, sender=Cargo)
+def tombstone_cargo_moved(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    current = {field: getattr(instance, field) for field, _ in CARGO_SCOPE_FIELDS}
+    left = cargo_scopes_for_values(loaded) - cargo_scopes_for_values(current)
+    if left:
+        Tombstone.record('cargo', instance.pk, left)
+
+
+@receiver(post_delete, sender=ContainerBooking)
+def tombstone_booking_deleted(sender, instance, **kwargs):
+    Tombstone.record('booking', instance.pk, booking_scopes(instance))
+
+
+@receiver(post_save, sender=ContainerBooking)
+def tombstone_booking_moved(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    current = {field: getattr(instance, field) for field, _ in BOOKING_SCOPE_FIELDS}
+    left = booking_scopes_for_values(loaded) - booking_scopes_for_values(current)
+    if left:
+        Tombstone.record('booking', instance.pk, left)
+
+
+@receiver(post_save, sender=ContainerBooking)
+def notify_booking_status_changed(sender, instance, created, **kwargs):
+    previous_status = getattr(instance, '_loaded_values', {}).get('status')
+    if not created and previous_status != instance.status:
+        # Queued in the saving transaction, the worker sends the email after commit
+        enqueue(notify_booking_status, instance.pk, instance.status)
+
+
+@receiver(post_save, sender=Cargo)
+def count_cargo_saved(sender, instance, created, **kwargs):
+    old = None if created else stats_values(instance, CARGO_STATS_FIELDS, getattr(instance, '_loaded_values', None))
+    record_change(cargo_counts, old, stats_values(instance, CARGO_STATS_FIELDS))
+
+
+@receiver(post_delete, sender=Cargo)
+def count_cargo_deleted(sender, instance, **kwargs):
+    record_change(cargo_counts, stats_values(instance, CARGO_STATS_FIELDS), None)
+
+
+@receiver(post_save, sender=ContainerBooking)
+def count_booking_saved(sender, instance, created, **kwargs):
+    old = None if created else stats_values(instance, BOOKING_STATS_FIELDS, getattr(instance, '_loaded_values', None))
+    record_change(booking_counts, old, stats_values(instance, BOOKING_STATS_FIELDS))
+
+
+@receiver(post_delete, sender=ContainerBooking)
+def count_booking_deleted(sender, instance, **kwargs):
+    record_change(booking_counts, stats_values(instance, BOOKING_STATS_FIELDS), None)
@@ -0,0 +1,182 @@
+"""
+Rollup statistics for management reports.
+
+DepotHourStats counts bookings per depot, hour and status, PortDayStats
+counts cargo arrivals, pickups and dwell days per port and day. Reports read
+these rollups instead of counting over ContainerBooking and Cargo.
+
+The rollups are kept up to date incrementally: a change subtracts the row's
+old contribution and adds its new one, usually one UPDATE per touched rollup
+row. Archiving leaves them alone, history stays counted. rebuild_stats()
+recomputes everything from the hot and archive tables, for backfills and
+after writes that bypass the models.
+"""
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import (
+    ArchivedCargo, ArchivedContainerBooking, Cargo, ContainerBooking, DepotHourStats, DepotSlot, PortDayStats,
+)
+
+BOOKING_STATS_FIELDS = ('depot_id', 'booking_time', 'status')
+CARGO_STATS_FIELDS = ('port_id', 'arrival_date', 'pickup_date', 'is_picked_up')
+STATUS_COUNTERS = ('pending', 'confirmed', 'completed', 'cancelled')
+PORT_COUNTERS = ('arrivals', 'pickups', 'dwell_days')
+REBUILD_BATCH_SIZE = 1000
+
+
+def booking_counts(values):
+    """What a booking with these BOOKING_STATS_FIELDS values adds to the rollups."""
+    counts = Counter()
+    if values and values['depot_id'] is not None and values['booking_time'] is not None:
+        key = (values['depot_id'], DepotSlot.slot_for(values['booking_time']))
+        counts[(DepotHourStats, key, values['status'].lower())] += 1
+    return counts
+
+
+def _as_date(value):
+    # Unsaved instances may still hold the strings they were created with
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def cargo_counts(values):
+    """What a cargo with these CARGO_STATS_FIELDS values adds to the rollups."""
+    counts = Counter()
+    if not values or values['port_id'] is None:
+        return counts
+    arrival_date, pickup_date = _as_date(values['arrival_date']), _as_date(values['pickup_date'])
+    counts[(PortDayStats, (values['port_id'], arrival_date), 'arrivals')] += 1
+    if values['is_picked_up']:
+        key = (PortDayStats, (values['port_id'], pickup_date))
+        counts[key + ('pickups',)] += 1
+        counts[key + ('dwell_days',)] += (pickup_date - arrival_date).days
+    return counts
+
+
+def _apply(model, key, changes):
+    lookup = dict(zip(model.KEY_FIELDS, key))
+    increments = {field: F(field) + delta for field, delta in changes.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    if all(delta < 0 for delta in changes.values()):
+        # Nothing to subtract from, e.g. the row went with its deleted depot
+        # or port earlier in the same cascade
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **changes)
+    except IntegrityError:
+        # Created by a concurrent change in the meantime
+        model.objects.filter(**lookup).update(**increments)
+
+
+def apply_counts(counts):
+    """Add a Counter of signed (model, key, field) deltas to the rollups."""
+    rows = defaultdict(dict)
+    for (model, key, field), delta in counts.items():
+        if delta:
+            rows[(model, key)][field] = delta
+    if not rows:
+        return
+    with transaction.atomic():
+        for (model, key), changes in rows.items():
+            _apply(model, key, changes)
+
+
+def changed_counts(counts, old, new):
+    """Rollup deltas of a row going from values ``old`` to ``new``, None for no row."""
+    delta = counts(new)
+    delta.subtract(counts(old))
+    return delta
+
+
+def record_change(counts, old, new):
+    apply_counts(changed_counts(counts, old, new))
+
+
+def stats_values(instance, fields, loaded=None):
+    """The instance's values of ``fields``, or its loaded values where known."""
+    loaded = loaded or {}
+    return {field: loaded[field] if field in loaded else getattr(instance, field) for field in fields}
+
+
+def _depot_rows():
+    counts = defaultdict(Counter)
+    for model in (ContainerBooking, ArchivedContainerBooking):
+        grouped = model.objects.annotate(hour=TruncHour('booking_time')).values('depot_id', 'hour', 'status').annotate(
+            count=Count('id')
+        ).order_by()
+        for row in grouped.iterator():
+            counts[(row['depot_id'], row['hour'])][row['status'].lower()] += row['count']
+    return [DepotHourStats(depot_id=depot_id, hour=hour, **counters) for (depot_id, hour), counters in counts.items()]
+
+
+def _port_rows():
+    counts = defaultdict(Counter)
+    for model in (Cargo, ArchivedCargo):
+        arrivals = model.objects.values('port_id', 'arrival_date').annotate(count=Count('id')).order_by()
+        for row in arrivals.iterator():
+            counts[(row['port_id'], row['arrival_date'])]['arrivals'] += row['count']
+        # Grouped by both dates, so the dwell time of a group is one subtraction
+        pickups = model.objects.filter(is_picked_up=True).values('port_id', 'pickup_date', 'arrival_date').annotate(
+            count=Count('id')
+        ).order_by()
+        for row in pickups.iterator():
+            day = counts[(row['port_id'], row['pickup_date'])]
+            day['pickups'] += row['count']
+            day['dwell_days'] += row['count'] * (row['pickup_date'] - row['arrival_date']).days
+    return [PortDayStats(port_id=port_id, day=day, **counters) for (port_id, day), counters in counts.items()]
+
+
+def rebuild_stats():
+    """Recompute every rollup row with one grouped scan per table, returns the row counts."""
+    with transaction.atomic():
+        depot_rows, port_rows = _depot_rows(), _port_rows()
+        DepotHourStats.objects.all().delete()
+        PortDayStats.objects.all().delete()
+        DepotHourStats.objects.bulk_create(depot_rows, batch_size=REBUILD_BATCH_SIZE)
+        PortDayStats.objects.bulk_create(port_rows, batch_size=REBUILD_BATCH_SIZE)
+    return {'depot_hours': len(depot_rows), 'port_days': len(port_rows)}
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def depot_utilization(depot_ids, start, end, granularity='day'):
+    """
+    Bookings by status per depot and hour or day for the days [start, end],
+    read from the rollups. ``depot_ids`` None means every depot.
+    """
+    rows = DepotHourStats.objects.filter(hour__gte=day_start(start), hour__lt=day_start(end + timedelta(days=1)))
+    if depot_ids is not None:
+        rows = rows.filter(depot_id__in=depot_ids)
+    if granularity == 'hour':
+        rows = rows.annotate(period=F('hour'))
+    else:
+        rows = rows.annotate(period=TruncDate('hour'))
+    rows = rows.values('depot_id', 'period').annotate(
+        **{f'{counter}_total': Sum(counter) for counter in STATUS_COUNTERS}
+    ).order_by('depot_id', 'period')
+    return [
+        {'depot_id': row['depot_id'], 'period': row['period'],
+         **{counter: row[f'{counter}_total'] for counter in STATUS_COUNTERS}}
+        for row in rows
+    ]
+
+
+def port_throughput(port_ids, start, end):
+    """Arrivals, pickups and average dwell days per port and day for the days [start, end]."""
+    rows = PortDayStats.objects.filter(day__gte=start, day__lte=end)
+    if port_ids is not None:
+        rows = rows.filter(port_id__in=port_ids)
+    return [
+        {'port_id': row['port_id'], 'period': row['day'], 'arrivals': row['arrivals'], 'pickups': row['pickups'],
+         'average_dwell_days': round(row['dwell_days'] / row['pickups'], 2) if row['pickups'] else None}
+        for row in rows.values('port_id', 'day', *PORT_COUNTERS).order_by('port_id', 'day')
+    ]
@@ -0,0 +1,205 @@
+"""
+Delta sync for the driver app.
+
+A client keeps a local copy of its bookings and cargo and polls with the
+watermark of its last sync. Only rows whose updated_at moved past the
+watermark are sent, plus Tombstone rows for cargo and bookings that were
+deleted or left the driver's scopes since. Every collection is read as a
+keyset range on (updated_at, id) with a limit, so a poll costs a few index
+range scans however long the driver's history is.
+
+Rows changed in the last SYNC_SETTLE_SECONDS are left for the next poll, so
+a transaction that saved before the watermark but commits after it is not
+skipped. Clients apply a tombstone only when its deleted_at is not older
+than their copy's updated_at, since a row can leave a scope and come back.
+"""
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Cargo, ContainerBooking, Tombstone
+from .pagination import CursorEncoder
+
+SYNC_CARGO_FIELDS = (
+    'id', 'cargo_number', 'cargo_owner', 'storage', 'arrival_date', 'pickup_date',
+    'scheduled_pickup_time', 'cfs_received', 'cfs_picked_up', 'is_picked_up', 'stage', 'updated_at',
+)
+SYNC_BOOKING_FIELDS = ('id', 'container_number', 'depot_id', 'booking_time', 'status', 'created_at', 'updated_at')
+COLLECTIONS = ('cargo', 'bookings', 'deleted')
+
+
+def page_size():
+    return getattr(settings, 'SYNC_PAGE_SIZE', 500)
+
+
+def settle_seconds():
+    return getattr(settings, 'SYNC_SETTLE_SECONDS', 5)
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+class InvalidWatermark(Exception):
+    pass
+
+
+class Watermark:
+    """
+    Where a client is in each collection, as (timestamp, id) positions, plus
+    the time its first sync started.
+    """
+
+    def __init__(self, started, positions):
+        self.started = started
+        self.positions = positions
+
+    @classmethod
+    def initial(cls, horizon):
+        # Nothing deleted before the first read can be in the client's copy
+        return cls(horizon, {'cargo': None, 'bookings': None, 'deleted': (horizon, 0)})
+
+    def encode(self):
+        payload = json.dumps({
+            's': self.started,
+            'p': {name: position and list(position) for name, position in self.positions.items()},
+        }, cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _timestamp(value):
+        timestamp = parse_datetime(value)
+        if timestamp is None or timezone.is_naive(timestamp):
+            raise ValueError(value)
+        return timestamp
+
+    @classmethod
+    def _position(cls, value):
+        """A [timestamp, id] pair from a token as a tuple, None stays None."""
+        if value is None:
+            return None
+        if not isinstance(value, list) or len(value) != 2 or type(value[1]) is not int:
+            raise ValueError(value)
+        return cls._timestamp(value[0]), value[1]
+
+    @classmethod
+    def decode(cls, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            started = cls._timestamp(payload['s'])
+            positions = {name: cls._position(payload['p'][name]) for name in COLLECTIONS}
+        except (binascii.Error, ValueError, KeyError, TypeError, UnicodeDecodeError):
+            raise InvalidWatermark(token)
+        # Every watermark handed out has read the tombstones from somewhere
+        if positions['deleted'] is None:
+            raise InvalidWatermark(token)
+        return cls(started, positions)
+
+
+def _after(field, position):
+    if position is None:
+        return Q()
+    timestamp, pk = position
+    return Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'pk__gt': pk})
+
+
+async def _changed(querysets, field, position, horizon, limit):
+    """
+    Up to ``limit`` rows after ``position`` from the union of ``querysets``,
+    in (field, id) order, and whether more are left. Each queryset is read
+    on its own so that every read is one index range scan.
+    """
+    rows = {}
+    for queryset in querysets:
+        queryset = queryset.filter(_after(field, position), **{f'{field}__lte': horizon})
+        async for obj in queryset.order_by(field, 'pk')[:limit + 1]:
+            rows[obj.pk] = obj
+    ordered = sorted(rows.values(), key=lambda obj: (getattr(obj, field), obj.pk))
+    return ordered[:limit], len(ordered) > limit
+
+
+def cargo_list_for(driver, cargo):
+    """Which of the driver's cargo lists the cargo belongs in, or None."""
+    if cargo.driver_id == driver.pk:
+        return 'picked' if cargo.is_picked_up else 'scheduled'
+    if cargo.driver_id is None and not cargo.is_picked_up and cargo.owner_company_id == driver.company_id:
+        return 'available'
+    return None
+
+
+def driver_scopes(driver):
+    return [f'driver:{driver.pk}'] + ([f'owner:{driver.company_id}'] if driver.company_id else [])
+
+
+async def driver_changes(driver, token=None, limit=None):
+    """
+    The driver's cargo, bookings and tombstones changed since the watermark
+    ``token``, and the watermark to send next time. Without a token, or with
+    one that is malformed or older than the tombstone retention, the full
+    current state is sent with ``reset`` set so the client drops its copy.
+    Clients call again straight away while ``has_more`` is set.
+    """
+    limit = limit or page_size()
+    now = timezone.now()
+    horizon = now - timedelta(seconds=settle_seconds())
+    watermark, reset = None, True
+    if token:
+        try:
+            watermark = Watermark.decode(token)
+            reset = watermark.positions['deleted'][0] < now - tombstone_retention()
+        except InvalidWatermark:
+            pass
+    if reset:
+        watermark = Watermark.initial(horizon)
+
+    # Company cargo that was not available when the client first synced and
+    # has not changed since is none of its business
+    company_cargo = Cargo.objects.owned_by(driver.company_id).filter(
+        Q(driver__isnull=True, is_picked_up=False) | Q(updated_at__gt=watermark.started)
+    )
+    reads = {
+        'cargo': ([company_cargo, Cargo.objects.filter(driver=driver)], 'updated_at'),
+        'bookings': ([ContainerBooking.objects.filter(driver=driver)], 'updated_at'),
+        'deleted': ([Tombstone.objects.filter(scope=scope) for scope in driver_scopes(driver)], 'deleted_at'),
+    }
+    changes, has_more = {}, False
+    for name, (querysets, field) in reads.items():
+        position = watermark.positions[name]
+        rows, more = await _changed(querysets, field, position, horizon, limit)
+        changes[name] = rows
+        has_more = has_more or more
+        if more:
+            watermark.positions[name] = (getattr(rows[-1], field), rows[-1].pk)
+        elif position is None or position[0] < horizon:
+            # Everything up to the horizon has been read
+            watermark.positions[name] = (horizon, 0)
+
+    cargo = []
+    for obj in changes['cargo']:
+        data = {field: getattr(obj, field) for field in SYNC_CARGO_FIELDS}
+        data['list'] = cargo_list_for(driver, obj)
+        cargo.append(data)
+    deleted = {}
+    for tombstone in changes['deleted']:
+        # A deleted cargo has a tombstone per scope, the client needs one
+        deleted.setdefault((tombstone.kind, tombstone.object_id), tombstone.deleted_at)
+    return {
+        'reset': reset,
+        'cargo': cargo,
+        'bookings': [{field: getattr(obj, field) for field in SYNC_BOOKING_FIELDS} for obj in changes['bookings']],
+        'deleted': [{'kind': kind, 'id': pk, 'deleted_at': deleted_at} for (kind, pk), deleted_at in deleted.items()],
+        'watermark': watermark.encode(),
+        'has_more': has_more,
+    }
+
+
+def prune_tombstones(now=None):
+    """Delete tombstones past the retention, clients that old resync anyway."""
+    return Tombstone.prune((now or timezone.now()) - tombstone_retention())
@@ -0,0 +1,214 @@
+"""
+Database-backed background task queue.
+
+Functions decorated with @task run in a ``manage.py run_worker`` process
+instead of the request. enqueue() writes the Task row in the caller's
+transaction, so a worker sees it once that transaction commits and never if
+it rolls back, and no broker is needed.
+
+Workers claim up to TASK_BATCH_SIZE due tasks in one short transaction and
+own them for TASK_VISIBILITY_TIMEOUT seconds. When a worker dies its tasks
+stay RUNNING until the timeout passes, then another worker takes them over.
+Failed tasks are retried with exponential backoff up to their max_attempts,
+so tasks must be safe to run more than once.
+"""
+import importlib
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def default_max_attempts():
+    return getattr(settings, 'TASK_MAX_ATTEMPTS', 5)
+
+
+def retry_delay():
+    return getattr(settings, 'TASK_RETRY_DELAY', 10)
+
+
+def max_retry_delay():
+    return getattr(settings, 'TASK_MAX_RETRY_DELAY', 3600)
+
+
+def visibility_timeout():
+    return getattr(settings, 'TASK_VISIBILITY_TIMEOUT', 300)
+
+
+def default_batch_size():
+    return getattr(settings, 'TASK_BATCH_SIZE', 20)
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Register ``func`` as a background task, to be queued with enqueue()."""
+    def register(func):
+        func.task_name = name or f'{func.__module__}.{func.__qualname__}'
+        func.max_attempts = max_attempts
+        _registry[func.task_name] = func
+        return func
+    return register(func) if func else register
+
+
+def load_tasks():
+    for module in getattr(settings, 'TASK_MODULES', ['users.tasks']):
+        importlib.import_module(module)
+
+
+def get_task(name):
+    if name not in _registry:
+        load_tasks()
+    try:
+        return _registry[name]
+    except KeyError:
+        raise UnknownTask(name)
+
+
+def enqueue(func, *args, **kwargs):
+    """
+    Queue ``func(*args, **kwargs)`` for a worker. The arguments are stored as
+    JSON, so pass ids rather than model instances.
+    """
+    if not hasattr(func, 'task_name'):
+        raise TypeError(f'{func!r} is not a registered task.')
+    return Task.objects.create(
+        name=func.task_name, args=list(args), kwargs=kwargs, max_attempts=func.max_attempts or default_max_attempts()
+    )
+
+
+def claim(worker, limit):
+    """Claim up to ``limit`` due tasks for ``worker``, oldest first."""
+    now = timezone.now()
+    # QUEUED tasks that are due and RUNNING ones whose claim expired
+    due = Task.objects.filter(status__in=('QUEUED', 'RUNNING'), available_at__lte=now)
+    # A plain read first, so an idle worker does not take the write lock every poll
+    if not due.exists():
+        return []
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'
+    with transaction.atomic():
+        due.filter(status='RUNNING', attempts__gte=F('max_attempts')).update(
+            status='FAILED', last_error='The last attempt did not finish within the visibility timeout.'
+        )
+        candidates = due.filter(attempts__lt=F('max_attempts')).order_by('available_at', 'id')
+        if connections[DEFAULT_DB_ALIAS].features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:limit])
+        # Filtered on the due condition again, so only one of two racing workers wins a task
+        due.filter(pk__in=ids).update(
+            status='RUNNING',
+            claimed_by=token,
+            attempts=F('attempts') + 1,
+            available_at=now + timedelta(seconds=visibility_timeout()),
+        )
+        return list(Task.objects.filter(pk__in=ids, claimed_by=token).order_by('available_at', 'id'))
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying after the ``attempts``-th failure."""
+    delay = min(max_retry_delay(), retry_delay() * 2 ** (attempts - 1))
+    # Full jitter, so tasks that failed together do not retry together
+    return random.uniform(0, delay)
+
+
+def release(tasks):
+    """Give claimed tasks that were not started back to the queue."""
+    Task.objects.filter(pk__in=[t.pk for t in tasks], claimed_by=tasks[0].claimed_by).update(
+        status='QUEUED', claimed_by='', attempts=F('attempts') - 1, available_at=timezone.now()
+    )
+
+
+def run_claimed(tasks, stop=None):
+    """
+    Run claimed tasks in order and record the results, returns how many
+    succeeded while still claimed. Stops early when ``stop`` is set and
+    releases the rest.
+    """
+    done = []
+    for index, claimed in enumerate(tasks):
+        if stop is not None and stop.is_set():
+            release(tasks[index:])
+            break
+        try:
+            get_task(claimed.name)(*claimed.args, **claimed.kwargs)
+        except Exception:
+            logger.exception('Task %s %s failed on attempt %d', claimed.pk, claimed.name, claimed.attempts)
+            failed = claimed.attempts >= claimed.max_attempts
+            # Only while the claim is ours, a task past its visibility timeout may run elsewhere
+            Task.objects.filter(pk=claimed.pk, claimed_by=claimed.claimed_by).update(
+                status='FAILED' if failed else 'QUEUED',
+                available_at=timezone.now() + timedelta(seconds=0 if failed else backoff(claimed.attempts)),
+                last_error=traceback.format_exc(),
+            )
+        else:
+            done.append(claimed.pk)
+    if not done:
+        return 0
+    return Task.objects.filter(pk__in=done, claimed_by=tasks[0].claimed_by).delete()[0]
+
+
+def work(worker, stop, batch_size=None, poll_interval=1.0, once=False):
+    """
+    Claim and run batches of tasks until ``stop`` is set, or with ``once``
+    until no task is due. Returns the number of tasks that succeeded.
+    """
+    succeeded = 0
+    try:
+        while not stop.is_set():
+            tasks = claim(worker, batch_size or default_batch_size())
+            if not tasks:
+                if once:
+                    break
+                stop.wait(poll_interval)
+                continue
+            succeeded += run_claimed(tasks, stop)
+    finally:
+        connections.close_all()
+    return succeeded
+
+
+def worker_name(index):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def start_workers(concurrency, pool='thread', **options):
+    """
+    Start ``concurrency`` worker loops as threads or processes, returns the
+    stop event and the started workers. Each loop claims its own batches.
+    """
+    if pool == 'process':
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        # Forked children must not share the parent's database connections
+        connections.close_all()
+        workers = [
+            context.Process(target=work, args=(worker_name(index), stop), kwargs=options, daemon=True)
+            for index in range(concurrency)
+        ]
+    else:
+        stop = threading.Event()
+        workers = [
+            threading.Thread(target=work, args=(worker_name(index), stop), kwargs=options, daemon=True)
+            for index in range(concurrency)
+        ]
+    for worker in workers:
+        worker.start()
+    return stop, workers
@@ -0,0 +1,55 @@
+"""
+Background tasks, run by manage.py run_worker. Queue them with
+users.taskqueue.enqueue().
+"""
+from collections import Counter
+from functools import partial
+
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models.functions import TruncHour
+
+from .caching import bump_scope_versions
+from .models import ContainerBooking, DepotCapacity, DepotSlot
+from .taskqueue import task
+
+
+@task
+def notify_booking_status(booking_id, status):
+    """Email the driver that their booking moved to ``status``."""
+    booking = ContainerBooking.objects.select_related('driver', 'depot').filter(pk=booking_id).first()
+    if booking is None or booking.status != status or not booking.driver.email:
+        # Gone, or changed again since, the newer change sends its own email
+        return
+    send_mail(
+        f'Container booking {booking.container_number}: {booking.get_status_display()}',
+        f'Your booking at {booking.depot.company_name} for {booking.booking_time:%Y-%m-%d %H:%M} '
+        f'is now {booking.get_status_display().lower()}.',
+        None,
+        [booking.driver.email],
+    )
+
+
+@task
+def reconcile_depot_capacity(depot_id):
+    """
+    Recount the depot's reservation ledger from its active bookings. The
+    counters are kept in step on every booking change, this repairs drift
+    from rows changed behind the models' backs, e.g. with update().
+    """
+    with transaction.atomic():
+        active = ContainerBooking.objects.filter(depot_id=depot_id, status__in=ContainerBooking.ACTIVE_STATUSES)
+        by_slot = Counter(active.annotate(slot=TruncHour('booking_time')).values_list('slot', flat=True))
+        DepotCapacity.objects.filter(depot_id=depot_id).update(active_bookings=sum(by_slot.values()))
+        slots = {slot.slot_start: slot for slot in DepotSlot.objects.select_for_update().filter(depot_id=depot_id)}
+        changed = []
+        for slot_start, slot in slots.items():
+            if slot.booked != by_slot.get(slot_start, 0):
+                slot.booked = by_slot.get(slot_start, 0)
+                changed.append(slot)
+        DepotSlot.objects.bulk_update(changed, ['booked'])
+        DepotSlot.objects.bulk_create(
+            [DepotSlot(depot_id=depot_id, slot_start=slot_start, booked=count)
+             for slot_start, count in by_slot.items() if slot_start not in slots]
+        )
+        transaction.on_commit(partial(bump_scope_versions, f'depot:{depot_id}'))
@@ -0,0 +1,292 @@
+"""
+Regression tests. The query plan tests read SQLite's EXPLAIN QUERY PLAN
+output, so they only run on SQLite. The query budget tests seed worlds of a
+few thousand rows and take a while.
+"""
+import base64
+import json
+import re
+from datetime import date, timedelta
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .api import BOOKING_ORDERING, driver_cargo_list
+from . import imports
+from .archive import booking_history
+from .models import Cargo, ContainerBooking, CustomUser, DepotCapacity, DepotSlot
+from .seeding import seed_email, seed_world
+from .sync import InvalidWatermark, Watermark
+from .urls import urlpatterns
+from .views import CREATED_ORDERING
+
+# url name: (user type or None for anonymous, method, queries). Authenticated
+# requests include the session and user lookups.
+QUERY_BUDGETS = {
+    'home': (None, 'get', 0),
+    'register': (None, 'get', 0),
+    'login': (None, 'get', 0),
+    'logout': ('PORT', 'get', 4),
+    'dashboard': ('PORT', 'get', 3),
+    'port_dashboard': ('PORT', 'get', 3),
+    'cfs_dashboard': ('CFS', 'get', 3),
+    'depot_dashboard': ('DEPOT', 'get', 2),
+    'driver_dashboard': ('DRIVER', 'get', 3),
+    'driver_available_cargo': ('DRIVER', 'get', 3),
+    'driver_scheduled_cargo': ('DRIVER', 'get', 3),
+    'driver_picked_cargo': ('DRIVER', 'get', 4),
+    'cargo_list': ('PORT', 'get', 4),
+    'cargo_create': ('PORT', 'get', 2),
+    'cargo_export': ('PORT', 'get', 4),
+    'cargo_import': ('PORT', 'get', 2),
+    'cargo_update': ('PORT', 'get', 3),
+    'cargo_delete': ('PORT', 'get', 3),
+    'cargo_toggle_status': ('PORT', 'post', 6),
+    'cargo_bulk_status': ('CFS', 'post', 6),
+    'schedule_pickup': ('DRIVER', 'get', 3),
+    'depot_capacity': ('DEPOT', 'get', 4),
+    'depot_availability': ('DEPOT', 'get', 4),
+    'container_booking_list': ('DRIVER', 'get', 4),
+    'container_booking_create': ('DRIVER', 'get', 4),
+    'api_driver_cargo': ('DRIVER', 'get', 3),
+    'api_driver_bookings': ('DRIVER', 'get', 5),
+    'api_driver_sync': ('DRIVER', 'get', 7),
+    'board_events': ('DEPOT', 'get', 2),
+    'perf_report': ('STAFF', 'get', 2),
+    'analytics': ('STAFF', 'get', 4),
+    'demand_forecast': ('STAFF', 'get', 6),
+}
+BUDGET_SIZES = (10, 1000)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.port = CustomUser.objects.create(username='port', email='port@example.com', user_type='PORT')
+        cls.depot = CustomUser.objects.create(username='depot', email='depot@example.com', user_type='DEPOT')
+        cls.cfs = CustomUser.objects.create(
+            username='cfs', email='cfs@example.com', user_type='CFS', company_name='Acme Freight'
+        )
+        cls.driver = CustomUser.objects.create(
+            username='driver', email='driver@example.com', user_type='DRIVER', company_name='Acme Freight'
+        )
+
+    def assertPlan(self, queryset, index):
+        """The query searches ``index`` and needs no sort of its own."""
+        plan = queryset.explain()
+        self.assertRegex(plan, rf'SEARCH \S+ USING (COVERING )?INDEX {re.escape(index)} ')
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_port_cargo_list(self):
+        self.assertPlan(Cargo.objects.filter(port=self.port).order_by(*CREATED_ORDERING), 'cargo_port_created_idx')
+
+    def test_cfs_dashboard(self):
+        cargo = Cargo.objects.stored_at(self.cfs.company_id)
+        self.assertPlan(cargo.order_by(*CREATED_ORDERING), 'cargo_storage_created_idx')
+
+    def test_driver_available_cargo(self):
+        queryset, ordering = driver_cargo_list(self.driver, 'available')
+        self.assertPlan(queryset.order_by(*ordering), 'cargo_unassigned_idx')
+        # The dashboard's unassigned cargo, without the is_picked_up filter
+        dashboard = Cargo.objects.owned_by(self.driver.company_id).filter(driver__isnull=True)
+        self.assertPlan(dashboard.order_by(*CREATED_ORDERING), 'cargo_unassigned_idx')
+
+    def test_driver_scheduled_cargo(self):
+        queryset, ordering = driver_cargo_list(self.driver, 'scheduled')
+        self.assertPlan(queryset.order_by(*ordering), 'cargo_driver_scheduled_idx')
+
+    def test_driver_picked_cargo(self):
+        (hot, archived), ordering = driver_cargo_list(self.driver, 'picked')
+        self.assertPlan(hot.order_by(*ordering), 'cargo_driver_picked_idx')
+        self.assertPlan(archived.order_by(*ordering), 'archived_cargo_driver_idx')
+
+    def test_driver_booking_list(self):
+        hot, archived = booking_history(self.driver)
+        self.assertPlan(hot.select_related('depot').order_by(*BOOKING_ORDERING), 'booking_driver_time_idx')
+        self.assertPlan(archived.select_related('depot').order_by(*BOOKING_ORDERING), 'archived_booking_driver_idx')
+
+    def test_depot_active_bookings(self):
+        bookings = ContainerBooking.objects.filter(depot=self.depot).active()
+        self.assertPlan(bookings.select_related('driver').order_by('booking_time', 'id'), 'booking_depot_active_idx')
+
+    def test_active_matches_statuses(self):
+        now = timezone.now()
+        ContainerBooking.objects.bulk_create([
+            ContainerBooking(driver=self.driver, depot=self.depot, booking_time=now + timedelta(hours=index), status=status)
+            for index, (status, _) in enumerate(ContainerBooking.STATUS_CHOICES)
+        ])
+        self.assertQuerySetEqual(
+            ContainerBooking.objects.active().order_by('id'),
+            ContainerBooking.objects.filter(status__in=ContainerBooking.ACTIVE_STATUSES).order_by('id'),
+        )
+        # In a subquery the table is aliased
+        others = ContainerBooking.objects.filter(depot=OuterRef('depot')).active().exclude(pk=OuterRef('pk'))
+        expected = [
+            booking for booking in ContainerBooking.objects.order_by('id')
+            if ContainerBooking.objects.filter(
+                depot=booking.depot_id, status__in=ContainerBooking.ACTIVE_STATUSES
+            ).exclude(pk=booking.pk).exists()
+        ]
+        self.assertQuerySetEqual(ContainerBooking.objects.filter(Exists(others)).order_by('id'), expected)
+
+
+class DepotReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.depot = CustomUser.objects.create(username='depot', email='depot@example.com', user_type='DEPOT')
+        cls.booking_time = timezone.now() + timedelta(days=1)
+
+    def test_unconfigured_depot(self):
+        with self.assertRaisesMessage(ValidationError, 'This depot has not configured its capacity.'):
+            DepotSlot.reserve(self.depot, self.booking_time)
+        self.assertFalse(DepotCapacity.objects.filter(depot=self.depot).exists())
+
+    def test_reserve(self):
+        DepotCapacity.objects.create(depot=self.depot, total_capacity=1)
+        DepotSlot.reserve(self.depot, self.booking_time)
+        self.assertEqual(DepotCapacity.objects.get(depot=self.depot).active_bookings, 1)
+        with self.assertRaisesMessage(ValidationError, 'full capacity'):
+            DepotSlot.reserve(self.depot, self.booking_time)
+
+
+class CargoImportTests(TestCase):
+    CSV = [
+        'cargo_number,cargo_owner,storage,arrival_date,pickup_date',
+        'C-1,Acme,Store,2026-01-01,2026-01-05',
+        'C-2,Acme,Store,2026-01-01,2026-01-05',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.port = CustomUser.objects.create(username='port', email='port@example.com', user_type='PORT')
+
+    def import_racing(self, upsert):
+        """Import while C-1 is inserted after the batch checked which cargo exists."""
+        Cargo.objects.create(
+            cargo_number='C-1', cargo_owner='Other', storage='Store', arrival_date=date(2026, 1, 1),
+            pickup_date=date(2026, 1, 2), port=self.port,
+        )
+        existing, stale = imports._existing, iter([{}])
+        with mock.patch.object(imports, '_existing', side_effect=lambda cleaned: next(stale, None) or existing(cleaned)):
+            return imports.import_cargo(self.CSV, self.port, upsert=upsert)
+
+    def test_concurrent_insert_is_a_row_error(self):
+        result = self.import_racing(upsert=False)
+        self.assertEqual(result.errors, [{'row': 2, 'error': 'Cargo C-1 already exists.'}])
+        self.assertEqual((result.created, result.updated), (1, 0))
+        self.assertEqual(Cargo.objects.get(cargo_number='C-1').cargo_owner, 'Other')
+
+    def test_concurrent_insert_is_updated_on_upsert(self):
+        result = self.import_racing(upsert=True)
+        self.assertEqual(result.as_dict(), {'created': 1, 'updated': 1, 'errors': []})
+        self.assertEqual(Cargo.objects.get(cargo_number='C-1').cargo_owner, 'Acme')
+
+
+class WatermarkTests(SimpleTestCase):
+    def token(self, **changes):
+        now = timezone.now().isoformat()
+        payload = {'s': now, 'p': {'cargo': None, 'bookings': [now, 3], 'deleted': [now, 0]}}
+        payload['p'].update(changes)
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def test_round_trip(self):
+        watermark = Watermark.initial(timezone.now())
+        self.assertEqual(Watermark.decode(watermark.encode()).positions, watermark.positions)
+        self.assertEqual(Watermark.decode(self.token()).positions['bookings'][1], 3)
+
+    def test_malformed_positions(self):
+        now = timezone.now().isoformat()
+        for position in ([now, 0, 1], [now], 'ab', [], [now[:19], 0], [now, True], [now, '1'], [5, 1]):
+            with self.subTest(position=position), self.assertRaises(InvalidWatermark):
+                Watermark.decode(self.token(bookings=position))
+        with self.assertRaises(InvalidWatermark):
+            Watermark.decode(self.token(deleted=None))
+
+
+class QueryBudgetTests(TransactionTestCase):
+    """
+    Every URL is requested as the matching user with the cache cleared, so
+    cached fragments are rendered, in a world of 10 and one of 1,000 cargo
+    and bookings. A count that grows with the rows is the N+1 signature.
+    A TransactionTestCase, so atomic blocks run as in production and not as
+    savepoints.
+    """
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in urlpatterns if pattern.name}
+        self.assertEqual(sorted(names - set(QUERY_BUDGETS)), [], 'New views need a query budget.')
+
+    def seed(self, size):
+        """Seed a world with ``size`` cargo and bookings, returns its users and a fixed cargo."""
+        prefix = f'QB{size}'
+        seed_world(prefix=prefix, ports=2, cfs=2, depots=2, drivers=4, owners=2, cargo=size, bookings=size, days=60)
+        # The first seeded user of each type is the busiest
+        users = {user_type: CustomUser.objects.get(email=seed_email(prefix, user_type, 0))
+                 for user_type in ('PORT', 'CFS', 'DEPOT', 'DRIVER')}
+        users['STAFF'] = self.staff
+        # A registered cargo of the port, owned by the driver's company, so the
+        # cargo URLs do not depend on the random world
+        today = timezone.localdate()
+        cargo = Cargo.objects.create(
+            cargo_number=f'{prefix}-FIXED', cargo_owner=users['DRIVER'].company_name,
+            storage=users['CFS'].company_name, arrival_date=today, pickup_date=today, port=users['PORT'],
+        )
+        return users, cargo
+
+    def prepare(self, name, user, cargo):
+        """The URL and JSON body to request ``name`` with."""
+        if name == 'register':
+            return reverse(name) + '?type=port', None
+        if name == 'api_driver_cargo':
+            return reverse(name, args=['available']), None
+        if name == 'cargo_toggle_status':
+            return reverse(name, args=[cargo.pk, 'arrived_at_storage']), None
+        if name in ('cargo_update', 'cargo_delete', 'schedule_pickup'):
+            return reverse(name, args=[cargo.pk]), None
+        if name == 'cargo_bulk_status':
+            ids = list(Cargo.objects.stored_at(user.company_id).order_by('id').values_list('id', flat=True)[:5])
+            return reverse(name), json.dumps({'ids': ids, 'status_field': 'cfs_received', 'value': True})
+        return reverse(name), None
+
+    def request(self, method, url, data):
+        if data:
+            response = self.client.post(url, data, content_type='application/json')
+        else:
+            response = getattr(self.client, method)(url)
+        # Streaming responses run their queries while the body is consumed
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def test_query_budgets(self):
+        self.staff = CustomUser.objects.create(
+            username='budget-staff', email='budget-staff@example.com', user_type='PORT', is_staff=True
+        )
+        counts = {name: {} for name in QUERY_BUDGETS}
+        for size in BUDGET_SIZES:
+            users, cargo = self.seed(size)
+            for name, (user_type, method, budget) in QUERY_BUDGETS.items():
+                user = users.get(user_type)
+                with self.subTest(url=name, size=size):
+                    if user:
+                        self.client.force_login(user)
+                    else:
+                        self.client.logout()
+                    url, data = self.prepare(name, user, cargo)
+                    cache.clear()
+                    with self.assertNumQueries(budget) as queries:
+                        response = self.request(method, url, data)
+                    counts[name][size] = len(queries)
+                    # Only unhandled errors, board_events deliberately answers 501 here
+                    self.assertNotEqual(response.status_code, 500)
+        for name, by_size in counts.items():
+            with self.subTest(url=name):
+                # A size over budget already failed above and is not recorded
+                self.assertLessEqual(len(set(by_size.values())), 1, f'Query count depends on the number of rows: {by_size}')
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -18,15 +18,34 @@ urlpatterns = [
     # Cargo management URLs
     path('cargo/', views.cargo_list, name='cargo_list'),
     path('cargo/create/', views.cargo_create, name='cargo_create'),
+    path('cargo/export/', views.cargo_export, name='cargo_export'),
+    path('cargo/import/', views.cargo_import, name='cargo_import'),
     path('cargo/<int:pk>/update/', views.cargo_update, name='cargo_update'),
     path('cargo/<int:pk>/delete/', views.cargo_delete, name='cargo_delete'),
     path('cargo/<int:pk>/toggle/<str:status_field>/', views.cargo_toggle_status, name='cargo_toggle_status'),
+    path('cargo/bulk-status/', views.cargo_bulk_status, name='cargo_bulk_status'),
     path('cargo/<int:pk>/schedule-pickup/', views.schedule_pickup, name='schedule_pickup'),
     
     # Depot capacity management
     path('depot/capacity/', views.depot_capacity_view, name='depot_capacity'),
+    path('depot/availability/', views.depot_availability, name='depot_availability'),
     
     # Container booking
     path('driver/container-bookings/', views.container_booking_list, name='container_booking_list'),
     path('driver/container-bookings/create/', views.container_booking_create, name='container_booking_create'),
+
+    # Async JSON API for the driver app
+    path('api/driver/cargo/<str:kind>/', api.driver_cargo, name='api_driver_cargo'),
+    path('api/driver/bookings/', api.driver_bookings, name='api_driver_bookings'),
+    path('api/driver/sync/', api.driver_sync, name='api_driver_sync'),
+
+    # Live board updates, served under ASGI
+    path('events/', views.board_events, name='board_events'),
+
+    # Staff-only profiling data
+    path('perf/', views.perf_report, name='perf_report'),
+
+    # Utilization reports from the rollup tables
+    path('analytics/', views.analytics, name='analytics'),
+    path('analytics/forecast/', views.demand_forecast, name='demand_forecast'),
 ]
\ No newline at end of file
@@ -1,11 +1,61 @@
+import io
+import json
+from collections import Counter
+from functools import partial
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.exceptions import ValidationError
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import OperationalError, transaction
+from django.db.models import Count, F
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
+from datetime import date, datetime, time, timedelta
 from rest_framework_simplejwt.tokens import RefreshToken
-from .forms import CustomUserCreationForm, CargoForm, PickupScheduleForm, ContainerBookingForm
-from .models import CustomUser, Cargo, DepotCapacity, ContainerBooking
+from .forms import CustomUserCreationForm, CargoForm, CargoImportForm, PickupScheduleForm, ContainerBookingForm
+from .models import CustomUser, Cargo, DepotCapacity, DepotSlot, ContainerBooking, PickupSlot
+from .api import BOOKING_ORDERING, driver_cargo_list
+from .archive import booking_history
+from .pagination import DEFAULT_PAGE_SIZE, apaginate_keyset, paginate_keyset, page_as_json
+from .caching import bump_scope_versions, cached_fragment, conditional_on_scopes
+from .forecasting import cached_forecast, forecast_quantile, forecast_weeks
+from .exports import EXPORT_FORMATS, manifest_lines, manifest_rows, parse_manifest_filters
+from .events import board_channels, get_broker, publish_on_commit
+from .imports import import_cargo
+from .profiling import report as profiling_report
+from .retries import is_lock_error, retry_on_lock
+from .taskqueue import enqueue
+from .tasks import reconcile_depot_capacity
+from .signals import CARGO_SCOPE_FIELDS, cargo_scopes_for_values
+from .stats import CARGO_STATS_FIELDS, apply_counts, cargo_counts, changed_counts, depot_utilization, port_throughput
+
+CARGO_JSON_FIELDS = (
+    'id', 'cargo_number', 'cargo_owner', 'storage', 'arrival_date', 'pickup_date',
+    'scheduled_pickup_time', 'arrived_at_storage', 'is_picked_up', 'cfs_received',
+    'cfs_picked_up', 'stage', 'port_id', 'cfs_id', 'driver_id', 'created_at', 'updated_at',
+)
+CREATED_ORDERING = ('-created_at', '-id')
+MAX_AVAILABILITY_DAYS = 31
+MAX_DISPLAYED_IMPORT_ERRORS = 200
+MAX_BULK_STATUS_IDS = 1000
+# Longest from/to range of the analytics endpoint per granularity
+MAX_ANALYTICS_DAYS = {'hour': 31, 'day': 366}
+MAX_FORECAST_WEEKS = 156
+
+def wants_json(request):
+    return request.GET.get('format') == 'json'
+
+def render_cargo_page(request, template_name, page, context=None):
+    if wants_json(request):
+        return JsonResponse(page_as_json(page, CARGO_JSON_FIELDS))
+    context = dict(context or {}, cargo_list=page)
+    return render(request, template_name, context)
 
 def home(request):
     return render(request, 'home.html')
@@ -91,34 +141,100 @@ def logout_view(request):
     response.delete_cookie('access_token')
     return response
 
+def dashboard_scopes(user):
+    """Scopes of the cargo table on the user's dashboard, other dashboards show no rows."""
+    if user.user_type == 'PORT':
+        return [f'port:{user.pk}']
+    if user.user_type == 'CFS':
+        return [f'storage:{user.company_id}']
+    if user.user_type == 'DRIVER':
+        return [f'owner:{user.company_id}']
+    return []
+
+def own_scope(user_type, prefix):
+    """get_scopes for pages that only show rows of the user, as ``prefix:<user id>``."""
+    return lambda user: [f'{prefix}:{user.pk}'] if user.user_type == user_type else None
+
 @login_required
+@conditional_on_scopes(dashboard_scopes)
 def dashboard_view(request):
     user_type = request.user.user_type.lower()
     template_name = f'dashboard/{user_type}_dashboard.html'
     
     # Add cargo list for port and cfs users
-    context = {}
+    per_page = DEFAULT_PAGE_SIZE
     if user_type == 'port':
-        context['cargo_list'] = Cargo.objects.filter(port=request.user)
+        cargo_list = Cargo.objects.filter(port=request.user)
+        scope = f'port:{request.user.pk}'
+        # The port dashboard only shows the most recent cargo
+        per_page = 5
     elif user_type == 'cfs':
-        context['cargo_list'] = Cargo.objects.filter(storage__icontains=request.user.company_name)
+        cargo_list = Cargo.objects.stored_at(request.user.company_id)
+        scope = f'storage:{request.user.company_id}'
     elif user_type == 'driver':
         # Show cargo for the driver's company
-        context['cargo_list'] = Cargo.objects.filter(
-            cargo_owner__icontains=request.user.company_name,
+        cargo_list = Cargo.objects.owned_by(request.user.company_id).filter(
             driver__isnull=True  # Only show unassigned cargo
         )
+        scope = f'owner:{request.user.company_id}'
+    else:
+        return render(request, template_name)
     
-    return render(request, template_name, context)
+    if wants_json(request):
+        return render_cargo_page(request, template_name, paginate_keyset(request, cargo_list, CREATED_ORDERING, per_page))
+    
+    # The rendered table is cached until a signal bumps the scope version
+    cargo_table = cached_fragment(
+        request, f'{user_type}_dashboard', [scope], f'dashboard/_{user_type}_cargo_table.html',
+        lambda: {'cargo_list': paginate_keyset(request, cargo_list, CREATED_ORDERING, per_page)}
+    )
+    return render(request, template_name, {'cargo_table': cargo_table})
 
 @login_required
+@conditional_on_scopes(own_scope('PORT', 'port'))
 def cargo_list(request):
     if request.user.user_type != 'PORT':
         messages.error(request, 'Access denied. Only port users can view cargo list.')
         return redirect('dashboard')
     
     cargo_list = Cargo.objects.filter(port=request.user)
-    return render(request, 'dashboard/cargo_list.html', {'cargo_list': cargo_list})
+    # Per-stage counts come straight from the (port, stage) index
+    counts = dict(cargo_list.order_by().values_list('stage').annotate(count=Count('id')))
+    stage_counts = [(stage, label, counts.get(stage, 0)) for stage, label in Cargo.STAGE_CHOICES]
+    
+    stage = request.GET.get('stage')
+    if stage in counts:
+        cargo_list = cargo_list.filter(stage=stage)
+    page = paginate_keyset(request, cargo_list, CREATED_ORDERING)
+    return render_cargo_page(request, 'dashboard/cargo_list.html', page, {
+        'stage_counts': stage_counts,
+        'current_stage': stage,
+    })
+
+@login_required
+def cargo_export(request):
+    """Stream the cargo manifest as CSV or NDJSON."""
+    if request.user.user_type != 'PORT' and not request.user.is_staff:
+        messages.error(request, 'Access denied. Only port users can export cargo.')
+        return redirect('dashboard')
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'format must be one of: {", ".join(EXPORT_FORMATS)}.'}, status=400)
+    try:
+        filters = parse_manifest_filters(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not request.user.is_staff:
+        # Port users only ever see their own manifest
+        filters['port_id'] = request.user.pk
+
+    response = StreamingHttpResponse(
+        manifest_lines(export_format, manifest_rows(filters)),
+        content_type=EXPORT_FORMATS[export_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="cargo-manifest.{export_format}"'
+    return response
 
 @login_required
 def cargo_create(request):
@@ -139,6 +255,36 @@ def cargo_create(request):
     
     return render(request, 'dashboard/cargo_form.html', {'form': form, 'title': 'Create Cargo'})
 
+@login_required
+def cargo_import(request):
+    if request.user.user_type != 'PORT':
+        messages.error(request, 'Access denied. Only port users can import cargo.')
+        return redirect('dashboard')
+
+    result = None
+    if request.method == 'POST':
+        form = CargoImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            # Decode the upload lazily so large manifests are never read into memory at once
+            lines = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            result = import_cargo(lines, request.user, upsert=form.cleaned_data['upsert'])
+            if wants_json(request):
+                return JsonResponse(result.as_dict())
+            if result.created or result.updated:
+                messages.success(request, f'Imported cargo: {result.created} created, {result.updated} updated.')
+            if result.errors:
+                messages.error(request, f'{len(result.errors)} rows could not be imported.')
+        elif wants_json(request):
+            return JsonResponse({'errors': form.errors}, status=400)
+    else:
+        form = CargoImportForm()
+
+    return render(request, 'dashboard/cargo_import.html', {
+        'form': form,
+        'result': result,
+        'row_errors': result.errors[:MAX_DISPLAYED_IMPORT_ERRORS] if result else [],
+    })
+
 @login_required
 def cargo_update(request, pk):
     if request.user.user_type != 'PORT':
@@ -174,16 +320,21 @@ def cargo_delete(request, pk):
     return render(request, 'dashboard/cargo_confirm_delete.html', {'cargo': cargo})
 
 @login_required
-@login_required
-def container_booking_list(request):
-    if request.user.user_type != 'DRIVER':
+@conditional_on_scopes(own_scope('DRIVER', 'driver'))
+async def container_booking_list(request):
+    user = await request.auser()
+    request.user = user
+    if user.user_type != 'DRIVER':
         messages.error(request, 'Access denied. Only drivers can view container bookings.')
         return redirect('dashboard')
     
-    bookings = ContainerBooking.objects.filter(driver=request.user).order_by('-booking_time')
-    return render(request, 'dashboard/driver/container_bookings.html', {'bookings': bookings})
+    # The page is read here, the template must not query from the event loop
+    history = [bookings.select_related('depot') for bookings in booking_history(user)]
+    page = await apaginate_keyset(request, history, BOOKING_ORDERING)
+    return render(request, 'dashboard/driver/container_bookings.html', {'bookings': page})
 
 @login_required
+@retry_on_lock
 def container_booking_create(request):
     if request.user.user_type != 'DRIVER':
         messages.error(request, 'Access denied. Only drivers can book container slots.')
@@ -207,21 +358,28 @@ def container_booking_create(request):
                             form.add_error(field if field != '__all__' else None, error)
                 else:
                     form.add_error(None, str(e))
+            except OperationalError as e:
+                if is_lock_error(e):
+                    raise  # Retried by retry_on_lock
+                form.add_error(None, f'An error occurred: {str(e)}')
             except Exception as e:
                 form.add_error(None, f'An error occurred: {str(e)}')
     else:
         form = ContainerBookingForm()
 
     # Get depot capacities for context
-    depot_capacities = DepotCapacity.objects.select_related('depot').all()
+    depot_info = DepotCapacity.objects.with_booking_stats().order_by('depot__company_name').values(
+        'total_capacity', 'current_capacity', 'available', 'full', name=F('depot__company_name')
+    )
     depot_info = [
         {
-            'name': cap.depot.company_name,
-            'total': cap.total_capacity,
-            'current': cap.current_capacity,
-            'available': cap.available_capacity()
+            'name': cap['name'],
+            'total': cap['total_capacity'],
+            'current': cap['current_capacity'],
+            'available': cap['available'],
+            'full': cap['full'],
         }
-        for cap in depot_capacities
+        for cap in depot_info
     ]
     
     return render(request, 'dashboard/driver/container_booking_form.html', {
@@ -230,6 +388,45 @@ def container_booking_create(request):
     })
 
 @login_required
+def depot_availability(request):
+    """Remaining booking places per depot and hourly slot, as JSON."""
+    try:
+        days = max(1, min(int(request.GET.get('days', 7)), MAX_AVAILABILITY_DAYS))
+        start_date = request.GET.get('start')
+        if start_date:
+            start = timezone.make_aware(datetime.combine(date.fromisoformat(start_date), time.min))
+        else:
+            start = DepotSlot.slot_for(timezone.now())
+        depot_ids = [int(depot_id) for depot_id in request.GET.getlist('depot')]
+    except ValueError:
+        return JsonResponse({'error': 'Invalid depot, start or days parameter.'}, status=400)
+    end = start + timedelta(days=days)
+
+    depots = CustomUser.objects.filter(user_type='DEPOT')
+    if depot_ids:
+        depots = depots.filter(pk__in=depot_ids)
+    depots = list(depots.select_related('depot_capacity').only(
+        'id', 'company_name', 'depot_capacity__total_capacity', 'depot_capacity__active_bookings'
+    ))
+    remaining = DepotSlot.remaining_by_slot([depot.pk for depot in depots], start, end)
+
+    hours = [start + timedelta(hours=i) for i in range(days * 24)]
+    results = []
+    for depot in depots:
+        capacity = getattr(depot, 'depot_capacity', None)
+        results.append({
+            'id': depot.pk,
+            'name': depot.company_name,
+            'available_capacity': capacity.available_capacity() if capacity else None,
+            'slots': [
+                {'start': hour, 'remaining': remaining.get((depot.pk, hour), DepotSlot.SLOT_LIMIT)}
+                for hour in hours
+            ],
+        })
+    return JsonResponse({'start': start, 'end': end, 'slot_limit': DepotSlot.SLOT_LIMIT, 'depots': results})
+
+@login_required
+@conditional_on_scopes(own_scope('DEPOT', 'depot'))
 def depot_capacity_view(request):
     if request.user.user_type != 'DEPOT':
         messages.error(request, 'Access denied. Only depot users can manage capacity.')
@@ -242,9 +439,8 @@ def depot_capacity_view(request):
     
     # Get active bookings for this depot
     active_bookings = ContainerBooking.objects.filter(
-        depot=request.user,
-        status__in=['PENDING', 'CONFIRMED']
-    ).select_related('driver').order_by('booking_time')
+        depot=request.user
+    ).active().select_related('driver').order_by('booking_time', 'id')
     
     if request.method == 'POST':
         try:
@@ -255,7 +451,8 @@ def depot_capacity_view(request):
                 messages.error(request, f'Total capacity cannot be less than current bookings ({booked_count}).')
             else:
                 depot_capacity.total_capacity = total_capacity
-                depot_capacity.save()
+                depot_capacity.save(update_fields=['total_capacity', 'last_updated'])
+                enqueue(reconcile_depot_capacity, request.user.pk)
                 messages.success(request, 'Depot capacity updated successfully.')
                 return redirect('depot_capacity')
         except ValueError:
@@ -266,28 +463,37 @@ def depot_capacity_view(request):
         'active_bookings': active_bookings
     })
 
+def cargo_status_scope(user):
+    """Cargo a port or CFS user may update, and the status fields they control."""
+    if user.user_type == 'PORT':
+        return Cargo.objects.filter(port=user), ['arrived_at_storage', 'is_picked_up']
+    return Cargo.objects.stored_at(user.company_id), ['cfs_received', 'cfs_picked_up']
+
+@retry_on_lock
 def cargo_toggle_status(request, pk, status_field):
     user_type = request.user.user_type
     if user_type not in ['PORT', 'CFS']:
         messages.error(request, 'Access denied. Only port and CFS users can update cargo status.')
         return redirect('dashboard')
     
-    if user_type == 'PORT':
-        cargo = get_object_or_404(Cargo, pk=pk, port=request.user)
-        allowed_fields = ['arrived_at_storage', 'is_picked_up']
-    else:  # CFS
-        cargo = get_object_or_404(Cargo, pk=pk, storage__icontains=request.user.company_name)
-        allowed_fields = ['cfs_received', 'cfs_picked_up']
-    
-    if status_field not in allowed_fields:
-        messages.error(request, 'Invalid status field.')
-        return redirect('dashboard')
-    
-    # Update the status
-    setattr(cargo, status_field, not getattr(cargo, status_field))
-    if user_type == 'CFS' and status_field == 'cfs_received':
-        cargo.cfs = request.user  # Assign the CFS when cargo is received
-    cargo.save()
+    cargo_scope, allowed_fields = cargo_status_scope(request.user)
+    # Read and toggle in one transaction, so a retry starts from the stored value
+    with transaction.atomic():
+        cargo = get_object_or_404(cargo_scope.select_for_update(), pk=pk)
+        
+        if status_field not in allowed_fields:
+            messages.error(request, 'Invalid status field.')
+            return redirect('dashboard')
+        
+        # Update the status
+        try:
+            cargo.set_status(status_field, not getattr(cargo, status_field))
+        except ValidationError as e:
+            messages.error(request, ' '.join(e.messages))
+            return redirect('dashboard')
+        if user_type == 'CFS' and status_field == 'cfs_received':
+            cargo.cfs = request.user  # Assign the CFS when cargo is received
+        cargo.save()
     
     # Set status name based on user type and field
     if user_type == 'PORT':
@@ -303,58 +509,137 @@ def cargo_toggle_status(request, pk, status_field):
     return redirect('dashboard')
 
 @login_required
-def driver_available_cargo(request):
-    if request.user.user_type != 'DRIVER':
-        messages.error(request, 'Access denied. Only drivers can view available cargo.')
+@retry_on_lock
+def cargo_bulk_status(request):
+    """
+    Set one status flag on many cargo rows with a single scoped UPDATE.
+    Accepts form posts (ids, status_field, value) or the same keys as JSON,
+    and reports updated, unchanged, invalid_transition or not_found for every
+    requested id.
+    """
+    as_json = wants_json(request) or request.content_type == 'application/json'
+    if request.user.user_type not in ['PORT', 'CFS']:
+        if as_json:
+            return JsonResponse({'error': 'Only port and CFS users can update cargo status.'}, status=403)
+        messages.error(request, 'Access denied. Only port and CFS users can update cargo status.')
         return redirect('dashboard')
-    
-    cargo_list = Cargo.objects.filter(
-        cargo_owner__icontains=request.user.company_name,
-        driver__isnull=True,
-        is_picked_up=False
-    )
-    
-    return render(request, 'dashboard/driver/available_cargo.html', {
-        'cargo_list': cargo_list
-    })
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required.'}, status=405)
 
-@login_required
-def driver_scheduled_cargo(request):
-    if request.user.user_type != 'DRIVER':
-        messages.error(request, 'Access denied. Only drivers can view scheduled cargo.')
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body)
+            ids = [int(pk) for pk in payload.get('ids', [])]
+        except (ValueError, TypeError, AttributeError):
+            return JsonResponse({'error': 'Invalid JSON payload.'}, status=400)
+        status_field = payload.get('status_field')
+        value = payload.get('value', True) in (True, 'true', '1', 1)
+    else:
+        try:
+            ids = [int(pk) for pk in request.POST.getlist('ids')]
+        except ValueError:
+            ids = []
+        status_field = request.POST.get('status_field')
+        value = request.POST.get('value', 'true') in ('true', '1', 'on')
+
+    cargo_scope, allowed_fields = cargo_status_scope(request.user)
+    error = None
+    if status_field not in allowed_fields:
+        error = 'Invalid status field.'
+    elif not ids:
+        error = 'Select at least one cargo.'
+    elif len(ids) > MAX_BULK_STATUS_IDS:
+        error = f'At most {MAX_BULK_STATUS_IDS} cargo can be updated at once.'
+    if error:
+        if as_json:
+            return JsonResponse({'error': error}, status=400)
+        messages.error(request, error)
         return redirect('dashboard')
-    
-    cargo_list = Cargo.objects.filter(
-        driver=request.user,
-        is_picked_up=False
-    ).order_by('scheduled_pickup_time')
-    
-    return render(request, 'dashboard/driver/scheduled_cargo.html', {
-        'cargo_list': cargo_list
-    })
 
-@login_required
-def driver_picked_cargo(request):
-    if request.user.user_type != 'DRIVER':
-        messages.error(request, 'Access denied. Only drivers can view picked up cargo.')
+    results = {pk: 'not_found' for pk in ids}
+    to_update = []
+    # The rows are read and locked in the updating transaction, so no other
+    # change can invalidate a transition between the check and the UPDATE
+    with transaction.atomic():
+        # One read decides each id's outcome and which cache scopes to bump
+        fields = dict.fromkeys(['pk', 'stage', status_field, *(field for field, _ in CARGO_SCOPE_FIELDS), *CARGO_STATS_FIELDS])
+        rows = cargo_scope.select_for_update().filter(pk__in=ids).values(*fields)
+        scopes, counts = set(), Counter()
+        for row in rows:
+            if row[status_field] == value:
+                results[row['pk']] = 'unchanged'
+                continue
+            try:
+                Cargo.check_transition(row['stage'], status_field, value)
+            except ValidationError:
+                results[row['pk']] = 'invalid_transition'
+            else:
+                results[row['pk']] = 'updated'
+                to_update.append(row['pk'])
+                scopes |= cargo_scopes_for_values(row)
+                counts.update(changed_counts(cargo_counts, row, {**row, status_field: value}))
+
+        if to_update:
+            changes = {
+                status_field: value,
+                'stage': Cargo.stage_expression(**{status_field: value}),
+                'updated_at': timezone.now(),
+            }
+            if status_field == 'cfs_received':
+                changes['cfs'] = request.user  # Assign the CFS when cargo is received
+                scopes.add(f'storage:{request.user.company_id}')
+            cargo_scope.filter(pk__in=to_update).update(**changes)
+            # update() sends no post_save, so count, invalidate and notify here
+            apply_counts(counts)
+            transaction.on_commit(partial(bump_scope_versions, *scopes))
+            publish_on_commit(scopes, {
+                'type': 'cargo.bulk_updated', 'ids': to_update, 'status_field': status_field, 'value': value,
+            })
+
+    if as_json:
+        return JsonResponse({'status_field': status_field, 'value': value, 'results': results})
+    messages.success(request, f'Updated {len(to_update)} of {len(ids)} selected cargo.')
+    next_url = request.POST.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = 'dashboard'
+    return redirect(next_url)
+
+async def driver_cargo_page(request, kind, template_name):
+    """
+    Render one of the driver cargo lists without leaving the event loop: the
+    user and the page are read with the async ORM.
+    """
+    user = await request.auser()
+    # Templates read request.user, which would otherwise reload it synchronously
+    request.user = user
+    if user.user_type != 'DRIVER':
+        messages.error(request, 'Access denied. Only drivers can view cargo lists.')
         return redirect('dashboard')
-    
-    cargo_list = Cargo.objects.filter(
-        driver=request.user,
-        is_picked_up=True
-    ).order_by('-scheduled_pickup_time')
-    
-    return render(request, 'dashboard/driver/picked_cargo.html', {
-        'cargo_list': cargo_list
-    })
+
+    cargo_list, ordering = driver_cargo_list(user, kind)
+    page = await apaginate_keyset(request, cargo_list, ordering)
+    return render_cargo_page(request, template_name, page)
+
+@login_required
+async def driver_available_cargo(request):
+    return await driver_cargo_page(request, 'available', 'dashboard/driver/available_cargo.html')
+
+@login_required
+async def driver_scheduled_cargo(request):
+    return await driver_cargo_page(request, 'scheduled', 'dashboard/driver/scheduled_cargo.html')
+
+@login_required
+async def driver_picked_cargo(request):
+    return await driver_cargo_page(request, 'picked', 'dashboard/driver/picked_cargo.html')
 
 @login_required
+@retry_on_lock
 def schedule_pickup(request, pk):
     if request.user.user_type != 'DRIVER':
         messages.error(request, 'Access denied. Only drivers can schedule pickups.')
         return redirect('dashboard')
     
-    cargo = get_object_or_404(Cargo, pk=pk, cargo_owner__icontains=request.user.company_name, driver__isnull=True)
+    cargo = get_object_or_404(Cargo.objects.owned_by(request.user.company_id), pk=pk, driver__isnull=True)
     
     if request.method == 'POST':
         form = PickupScheduleForm(request.POST)
@@ -362,17 +647,128 @@ def schedule_pickup(request, pk):
             # Get the validated datetime
             pickup_datetime = form.cleaned_data['pickup_datetime']
             
-            # Schedule the pickup
-            cargo.scheduled_pickup_time = pickup_datetime
-            cargo.driver = request.user
-            cargo.save()
+            # Schedule the pickup, holding both the cargo row and the slot
+            with transaction.atomic():
+                cargo = get_object_or_404(
+                    Cargo.objects.owned_by(request.user.company_id).select_for_update(),
+                    pk=pk, driver__isnull=True
+                )
+                scheduled = PickupSlot.reserve(pickup_datetime)
+                if scheduled:
+                    cargo.scheduled_pickup_time = pickup_datetime
+                    cargo.driver = request.user
+                    cargo.save()
             
-            messages.success(request, 'Pickup scheduled successfully.')
-            return redirect('dashboard')
+            if scheduled:
+                messages.success(request, 'Pickup scheduled successfully.')
+                return redirect('dashboard')
+            form.add_error(None, 'This time slot is fully booked. Please select another time.')
     else:
         form = PickupScheduleForm()
     
     return render(request, 'dashboard/schedule_pickup.html', {
         'form': form,
         'cargo': cargo
-    })
\ No newline at end of file
+    })
+
+@staff_member_required
+def perf_report(request):
+    """Sampled query count and latency percentiles per URL name, as JSON."""
+    names = request.GET.getlist('name') or None
+    return JsonResponse({'views': profiling_report(names)})
+
+@login_required
+def analytics(request):
+    """
+    Depot bookings by status and port cargo throughput for the ``from`` to
+    ``to`` dates, the last 30 days by default, read only from the rollup
+    tables. Depots are reported per ``granularity``, hour or day. Staff see
+    every depot and port, depot and port users their own.
+    """
+    user = request.user
+    if user.is_staff:
+        depot_ids = port_ids = None
+    elif user.user_type == 'DEPOT':
+        depot_ids, port_ids = [user.pk], []
+    elif user.user_type == 'PORT':
+        depot_ids, port_ids = [], [user.pk]
+    else:
+        return JsonResponse({'error': 'Only staff, depot and port users can view analytics.'}, status=403)
+
+    try:
+        end = date.fromisoformat(request.GET['to']) if request.GET.get('to') else timezone.localdate()
+        start = date.fromisoformat(request.GET['from']) if request.GET.get('from') else end - timedelta(days=29)
+    except ValueError:
+        return JsonResponse({'error': 'from and to must be dates in YYYY-MM-DD format.'}, status=400)
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in MAX_ANALYTICS_DAYS:
+        return JsonResponse({'error': 'granularity must be hour or day.'}, status=400)
+    if not 0 <= (end - start).days < MAX_ANALYTICS_DAYS[granularity]:
+        return JsonResponse({
+            'error': f'from must be on or before to, at most {MAX_ANALYTICS_DAYS[granularity]} days for {granularity}.'
+        }, status=400)
+
+    return JsonResponse({
+        'from': start,
+        'to': end,
+        'granularity': granularity,
+        'depots': depot_utilization(depot_ids, start, end, granularity) if depot_ids != [] else [],
+        'ports': port_throughput(port_ids, start, end) if port_ids != [] else [],
+    })
+
+@login_required
+def demand_forecast(request):
+    """
+    Hour-of-week demand profiles and suggested slot limits as JSON. Staff
+    see every depot and the pickup windows, depots their own profile and
+    ports the pickup windows. Accepts ``weeks`` of history and ``quantile``.
+    """
+    user = request.user
+    if user.is_staff:
+        depot_ids, pickups = None, True
+    elif user.user_type == 'DEPOT':
+        depot_ids, pickups = [user.pk], False
+    elif user.user_type == 'PORT':
+        depot_ids, pickups = [], True
+    else:
+        return JsonResponse({'error': 'Only staff, depot and port users can view forecasts.'}, status=403)
+
+    try:
+        weeks = int(request.GET.get('weeks') or forecast_weeks())
+        quantile = float(request.GET.get('quantile') or forecast_quantile())
+    except ValueError:
+        return JsonResponse({'error': 'weeks must be a whole number and quantile a number.'}, status=400)
+    if not 1 <= weeks <= MAX_FORECAST_WEEKS or not 0.5 <= quantile < 1:
+        return JsonResponse({
+            'error': f'weeks must be between 1 and {MAX_FORECAST_WEEKS}, quantile at least 0.5 and below 1.'
+        }, status=400)
+    try:
+        return JsonResponse(cached_forecast(depot_ids, pickups, weeks, quantile))
+    except ImproperlyConfigured as e:
+        return JsonResponse({'error': str(e)}, status=501)
+
+def sse_message(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n"
+
+async def board_event_stream(channels):
+    subscription = get_broker().subscribe(channels)
+    heartbeat = getattr(settings, 'EVENTS_HEARTBEAT', 15)
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            event = await subscription.get(heartbeat)
+            # Comments keep proxies from closing an idle connection
+            yield sse_message(event) if event else ': keepalive\n\n'
+    finally:
+        subscription.close()
+
+@login_required
+async def board_events(request):
+    """Server-sent events for the user's board. Needs the ASGI server."""
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse('Live updates need the ASGI server.', status=501, content_type='text/plain')
+    user = await request.auser()
+    response = StreamingHttpResponse(board_event_stream(board_channels(user)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response